@@ -1,20 +1,34 @@
+import hashlib
+import time
 import streamlit as st
 import pandas as pd
 from parser_lr1 import (
     parse_grammar_text,
+    parse_precedence,
     first_sets,
     follow_sets,
     build_tables,
+    IncrementalGrammar,
+    default_cache,
+    LRStats,
+    MODES,
     first_follow_to_df,
     action_table_df,
     goto_table_df,
     states_to_str,
-    analizar_cadena_lr_con_arbol,
+    find_states,
+    analizar_cadena,
+    analizar_errores,
+    parse_glr,
+    ambiguous_nodes,
+    forest_to_tree,
+    forest_to_dot,
     tree_to_dot,
     tree_to_pretty_text,
     EPS,
     END
 )
+from examples import EXAMPLES
 
 st.set_page_config(page_title="LR(1) Visualizer", layout="wide", initial_sidebar_state="collapsed")
 
@@ -35,7 +49,7 @@ st.markdown(
 
 st.title("🧭 Analizador LR(1)")
 st.markdown(""" 
-Analizador sintáctico **LR(1) canónico** con visualización completa:
+Analizador sintáctico **LR(1)** (canónico, LALR(1) o LR(1) mínimo) con visualización completa:
 - Conjuntos **FIRST** y **FOLLOW**
 - Tablas **ACTION** y **GOTO**
 - **Items LR(1)** por estado
@@ -43,22 +57,27 @@ Analizador sintáctico **LR(1) canónico** con visualización completa:
 - **Árbol de derivación** gráfico
 """)
 
-EXAMPLES = {
-    "Gramática simple (S → CC)": """S -> C C
-C -> c C | d""",
-    "Expresiones aritméticas": """E -> E + T | T
-T -> T * F | F
-F -> ( E ) | id""",
-    "Paréntesis balanceados": """S -> ( S ) | ε""",
-    "if-then-else": """S -> i E t S | i E t S e S | a
-E -> b"""
-}
-
 with st.sidebar:
     st.header("⚙️ Configuración")
     selected_example = st.selectbox("Ejemplos predefinidos:", options=["Personalizado"] + list(EXAMPLES.keys()))
+    table_mode = st.selectbox("Tipo de tabla:", options=list(MODES), format_func=MODES.get)
+    compare_modes = st.checkbox("Comparar modos de tabla", value=False)
+    unit_elim = st.checkbox("Eliminar reducciones unitarias", value=False,
+                            help="Compone los GOTO de las producciones A → B; el árbol se reconstruye igual")
     show_states = st.checkbox("Mostrar items LR(1)", value=False)
     show_productions = st.checkbox("Mostrar producciones", value=False)
+    show_stats = st.checkbox("Instrumentación (contadores y tiempos)", value=False)
+    use_glr = st.checkbox("Análisis GLR si hay conflictos", value=False)
+    max_forest_nodes = st.number_input("Máx. nodos del bosque GLR", min_value=1000, value=1_000_000, step=100_000,
+                                       disabled=not use_glr)
+    recover_errors = st.checkbox("Recuperar errores (informar todos)", value=False)
+    sync_tokens = st.text_input("Tokens de sincronización (vacío = cualquiera)", "", disabled=not recover_errors)
+    repair_cost = st.number_input("Coste máx. de reparación (0 = solo modo pánico)", min_value=0, max_value=3, value=1,
+                                  disabled=not recover_errors)
+    max_tree_nodes = st.number_input("Máx. nodos del árbol", min_value=10, value=500, step=100)
+    max_tree_depth = st.number_input("Profundidad máx. del árbol (0 = sin límite)", min_value=0, value=0)
+    page_size = st.selectbox("Filas por página", options=[25, 50, 100, 200, 500], index=1)
+    compact_tables = st.checkbox("Ocultar columnas vacías de la página", value=True)
 
 if selected_example != "Personalizado":
     default_grammar = EXAMPLES[selected_example]
@@ -69,81 +88,246 @@ C -> c C | d"""
 gram_text = st.text_area("📘 Gramática", value=default_grammar, height=160)
 input_str = st.text_input("✍️ Cadena de entrada", "c c d d")
 
+def _remember(name, key, value, keep=4):
+    store = st.session_state.setdefault(name, {})
+    store.pop(key, None)
+    store[key] = value
+    while len(store) > keep:
+        store.pop(next(iter(store)))
+    return value
+
+def _build(gram_text):
+    key = hashlib.sha256(repr((gram_text, table_mode, unit_elim, compare_modes, show_stats)).encode("utf-8")).hexdigest()[:16]
+    hit = st.session_state.get("lr1_builds", {}).get(key)
+    if hit is not None:
+        return hit
+    prods, start, nonterminals, terminals = parse_grammar_text(gram_text)
+    precedence = parse_precedence(gram_text)
+    stats = LRStats() if show_stats else None
+    builds, build_ms, note = {}, {}, None
+    if compare_modes:
+        FIRST = first_sets(nonterminals, terminals, prods)
+        FOLLOW = follow_sets(nonterminals, terminals, prods, start, FIRST)
+        for mode in MODES:
+            t0 = time.perf_counter()
+            builds[mode] = build_tables(prods, start, terminals, nonterminals, FIRST, mode=mode,
+                                        stats=stats if mode == table_mode else None, precedence=precedence,
+                                        unit_elim=unit_elim)
+            build_ms[mode] = (time.perf_counter() - t0) * 1000
+    else:
+        inc = st.session_state.setdefault("lr1_incremental", IncrementalGrammar(cache=default_cache()))
+        t0 = time.perf_counter()
+        builds[table_mode] = inc.update(prods, start, nonterminals, terminals, mode=table_mode, stats=stats,
+                                        precedence=precedence, unit_elim=unit_elim)
+        build_ms[table_mode] = (time.perf_counter() - t0) * 1000
+        FIRST, FOLLOW = inc.FIRST, inc.FOLLOW
+        ch = inc.last_changes
+        note = (f"Reconstrucción incremental: {build_ms[table_mode]:.1f} ms · "
+                f"{len(ch['producciones'])} cabezas modificadas · FIRST recalculado para {len(ch['FIRST'])} · "
+                f"FOLLOW para {len(ch['FOLLOW'])} · " +
+                ("tablas leídas de la caché" if inc.from_cache else
+                 f"{inc.reused} estados reutilizados, {inc.rebuilt} calculados, "
+                 f"{inc.repacked} filas de ACTION/GOTO reempaquetadas"))
+    return _remember("lr1_builds", key, dict(
+        key=key, prods=prods, start=start, nonterminals=nonterminals, terminals=terminals,
+        FIRST=FIRST, FOLLOW=FOLLOW, builds=builds, build_ms=build_ms, note=note, stats=stats))
+
+def _parse(build, input_str):
+    key = (build["key"], input_str)
+    hit = st.session_state.get("lr1_parses", {}).get(key)
+    if hit is not None:
+        return hit
+    ACTION, GOTO, _, augmented, _ = build["builds"][table_mode]
+    result = analizar_cadena(input_str, ACTION, GOTO, augmented, build["stats"])
+    return _remember("lr1_parses", key, {"result": result})
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _action_page(key, rows, compact, _ACTION, _terminals, _nstates):
+    return action_table_df(_ACTION, _terminals, _nstates, rows, compact)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _goto_page(key, rows, compact, _GOTO, _nonterminals, _nstates):
+    return goto_table_df(_GOTO, _nonterminals, _nstates, rows, compact)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _states_page(key, rows, _states, _aug):
+    return states_to_str(_states, _aug, rows)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _find(key, query, _states, _aug):
+    return find_states(_states, _aug, query)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _trace_page(key, input_str, first, last, _trace, _aug):
+    return _trace.to_frame(_aug, first, last, split_goto=True, width=40)
+
+def _pager(label, total, key):
+    size = int(page_size)
+    pages = max(1, -(-total // size))
+    if st.session_state.get(key, 1) > pages:
+        st.session_state[key] = pages
+    page = st.number_input(f"Página de {label} (de {pages})", min_value=1, max_value=pages, key=key) if pages > 1 else 1
+    first = (page - 1) * size
+    last = min(total, first + size)
+    if total > size:
+        st.caption(f"{label}: {first + 1}–{last} de {total:,}")
+    return first, last
+
 if st.button("🚀 Analizar", type="primary"):
     if not gram_text.strip():
         st.error("❌ La gramática no puede estar vacía")
     elif not input_str.strip():
         st.error("❌ La cadena de entrada no puede estar vacía")
     else:
-        try:
-            with st.spinner("Construyendo parser LR(1)..."):
-                prods, start, nonterminals, terminals = parse_grammar_text(gram_text)
-                FIRST = first_sets(nonterminals, terminals, prods)
-                FOLLOW = follow_sets(nonterminals, terminals, prods, start, FIRST)
-                ACTION, GOTO, states, augmented, conflicts = build_tables(prods, start, terminals, nonterminals, FIRST)
-
-            col1, col2, col3, col4 = st.columns(4)
-            with col1: st.metric("Estados", len(states))
-            with col2: st.metric("No terminales", len(nonterminals))
-            with col3: st.metric("Terminales", len(terminals))
-            with col4: st.metric("Producciones", len(prods))
-
-            if conflicts:
-                st.warning("⚠️ **Conflictos detectados:**")
-                for c in conflicts: st.write(f"- {c}")
-            else:
-                st.success("✅ Gramática LR(1) válida (sin conflictos)")
-
-            st.subheader("📚 Conjuntos FIRST y FOLLOW")
-            ff_df = first_follow_to_df(FIRST, FOLLOW, nonterminals)
-            st.dataframe(ff_df, use_container_width=True)
-
-            if show_productions:
-                with st.expander("📜 Producciones de la gramática"):
-                    prod_text = "\n".join(f"{i}: {A} → {' '.join(B) if B else EPS}" for i, (A, B) in enumerate(prods))
-                    st.code(prod_text, language="bnf")
-
-            st.subheader("⚙️ Tablas ACTION y GOTO")
-            c1, c2 = st.columns([3, 2])
-            with c1:
-                st.caption("**ACTION** (terminales)")
-                act_df = action_table_df(ACTION, terminals, len(states))
-                st.dataframe(act_df, use_container_width=True)
-            with c2:
-                st.caption("**GOTO** (no terminales)")
-                goto_df = goto_table_df(GOTO, nonterminals, len(states))
-                st.dataframe(goto_df, use_container_width=True)
-
-            if show_states:
-                with st.expander("🔎 Items LR(1) por estado"):
-                    st.code(states_to_str(states, augmented))
-
-            st.subheader("🧾 Analizador Sintáctico LR(1)")
-            with st.spinner("Analizando cadena..."):
-                trace_df, root = analizar_cadena_lr_con_arbol(input_str, ACTION, GOTO, augmented, start)
-            st.dataframe(trace_df, use_container_width=True)
-
-            if root is not None:
-                st.subheader("🌳 Árbol de derivación")
-                tab1, tab2 = st.tabs(["📊 Visualización gráfica", "📝 Representación textual"])
+        st.session_state["lr1_run"] = (gram_text, input_str)
+
+run = st.session_state.get("lr1_run")
+if run is not None:
+    gram_text, input_str = run
+    try:
+        with st.spinner("Construyendo parser LR(1)..."):
+            build = _build(gram_text)
+        prods, start, nonterminals, terminals = build["prods"], build["start"], build["nonterminals"], build["terminals"]
+        builds, build_ms, stats = build["builds"], build["build_ms"], build["stats"]
+        ACTION, GOTO, states, augmented, conflicts = builds[table_mode]
+        bkey = build["key"]
+
+        col1, col2, col3, col4 = st.columns(4)
+        with col1: st.metric("Estados", len(states))
+        with col2: st.metric("No terminales", len(nonterminals))
+        with col3: st.metric("Terminales", len(terminals))
+        with col4: st.metric("Producciones", len(prods))
+
+        if build["note"]:
+            st.caption(build["note"])
+        if compare_modes:
+            st.subheader("📏 Comparación de modos")
+            for col, mode in zip(st.columns(len(builds)), builds):
+                with col:
+                    st.metric(MODES[mode], f"{len(builds[mode][2])} estados")
+                    st.caption(f"{build_ms[mode]:.1f} ms · {len(builds[mode][4])} conflictos")
+
+        if conflicts:
+            st.warning(f"⚠️ **Conflictos detectados ({len(conflicts)}):**")
+            for c in conflicts[:50]: st.write(f"- {c}")
+            if len(conflicts) > 50:
+                st.caption(f"… y {len(conflicts) - 50} más")
+        else:
+            st.success(f"✅ Gramática {MODES[table_mode]} válida (sin conflictos)")
+        if unit_elim and ACTION.tables.unit_chains:
+            st.caption(f"Reducciones unitarias eliminadas en {len(ACTION.tables.unit_chains)} transiciones GOTO · "
+                       f"{ACTION.tables.virtual} estados compuestos (no se muestran en las tablas)")
+        elif unit_elim and conflicts:
+            st.caption("Con conflictos sin resolver no se eliminan las reducciones unitarias.")
+
+        st.subheader("📚 Conjuntos FIRST y FOLLOW")
+        ff_df = first_follow_to_df(build["FIRST"], build["FOLLOW"], nonterminals)
+        st.dataframe(ff_df, use_container_width=True)
+
+        if show_productions:
+            with st.expander("📜 Producciones de la gramática"):
+                prod_text = "\n".join(f"{i}: {A} → {' '.join(B) if B else EPS}" for i, (A, B) in enumerate(prods))
+                st.code(prod_text, language="bnf")
+
+        st.subheader("⚙️ Tablas ACTION y GOTO")
+        query = st.text_input("🔍 Buscar estados (número, p. ej. `I12`, o texto de un item, p. ej. `E → E •`)", "")
+        shown = _find(bkey, query, states, augmented) if query.strip() else range(len(states))
+        if query.strip():
+            st.caption(f"{len(shown)} estados coinciden")
+        first, last = _pager("estados", len(shown), "lr1_state_page")
+        rows = tuple(shown[first:last])
+        c1, c2 = st.columns([3, 2])
+        with c1:
+            st.caption("**ACTION** (terminales)")
+            st.dataframe(_action_page(bkey, rows, compact_tables, ACTION, terminals, len(states)),
+                         use_container_width=True)
+        with c2:
+            st.caption("**GOTO** (no terminales)")
+            st.dataframe(_goto_page(bkey, rows, compact_tables, GOTO, nonterminals, len(states)),
+                         use_container_width=True)
+
+        if show_states:
+            with st.expander("🔎 Items LR(1) por estado", expanded=bool(query.strip())):
+                st.code(_states_page(bkey, rows, states, augmented))
+
+        st.subheader("🧾 Analizador Sintáctico LR(1)")
+        with st.spinner("Analizando cadena..."):
+            parsed = _parse(build, input_str)
+        result = parsed["result"]
+        root = result.tree
+        first, last = _pager("pasos de la traza", len(result.trace), "lr1_trace_page")
+        st.dataframe(_trace_page(bkey, input_str, first, last, result.trace, augmented),
+                     use_container_width=True)
+
+        if stats is not None:
+            with st.expander("📈 Instrumentación", expanded=True):
+                st.dataframe(pd.DataFrame(stats.rows(), columns=["Métrica", "Valor"]), use_container_width=True, hide_index=True)
+
+        if use_glr and conflicts:
+            st.subheader("🔀 Análisis GLR")
+            if parsed.get("glr_key") != int(max_forest_nodes):
+                parsed["glr_key"] = int(max_forest_nodes)
+                parsed["glr"] = parse_glr(input_str.strip().split(), ACTION.tables, max_nodes=int(max_forest_nodes))
+            glr = parsed["glr"]
+            if glr.accepted:
+                n_trees = glr.trees()
+                ambiguous = ambiguous_nodes(glr.forest)
+                c1, c2, c3 = st.columns(3)
+                c1.metric("Árboles", "∞" if n_trees == float("inf") else f"{n_trees:,}")
+                c2.metric("Nodos ambiguos", len(ambiguous))
+                c3.metric("Nodos GSS / SPPF", f"{glr.gss_nodes} / {glr.sppf_nodes}")
+                for f in ambiguous[:10]:
+                    st.write(f"- {f.title(augmented)} [{f.start}, {f.end}]: {len(f.families)} alternativas")
+                tab1, tab2 = st.tabs(["🌲 Bosque compartido", "🌳 Primer árbol"])
                 with tab1:
-                    try:
-                        dot = tree_to_dot(root)
-                        st.graphviz_chart(dot)
-                    except Exception as e:
-                        st.warning(f"No se pudo renderizar el árbol como gráfico: {e}")
-                        st.code(tree_to_pretty_text(root))
+                    forest_dot = forest_to_dot(glr.forest, augmented, max_nodes=int(max_tree_nodes))
+                    st.graphviz_chart(forest_dot)
+                    st.download_button("⬇️ Descargar bosque (DOT)", data=forest_to_dot(glr.forest, augmented, max_nodes=10**9), file_name="bosque.dot")
                 with tab2:
-                    st.code(tree_to_pretty_text(root))
+                    first_tree = forest_to_tree(glr.forest)
+                    st.graphviz_chart(tree_to_dot(first_tree, max_nodes=int(max_tree_nodes), max_depth=int(max_tree_depth) or None))
+            elif glr.truncated:
+                st.warning(f"⚠️ GLR: el bosque supera {int(max_forest_nodes):,} nodos en la posición {glr.pos}; análisis detenido")
             else:
-                st.error("❌ No se pudo construir el árbol (cadena rechazada)")
-
-        except ValueError as e:
-            st.error(f"❌ **Error en la gramática:** {str(e)}")
-        except Exception as e:
-            st.error(f"❌ **Error inesperado:** {str(e)}")
-            with st.expander("🐛 Detalles del error"):
-                st.exception(e)
+                st.error(f"❌ GLR: cadena rechazada en la posición {glr.pos} (token '{glr.token}')")
+
+        if root is not None:
+            st.subheader("🌳 Árbol de derivación")
+            caps = dict(max_nodes=int(max_tree_nodes), max_depth=int(max_tree_depth) or None)
+            n_nodes = len(root.arena)
+            if n_nodes > caps["max_nodes"]:
+                st.caption(f"El árbol tiene {n_nodes} nodos; se muestra una vista truncada.")
+            tab1, tab2 = st.tabs(["📊 Visualización gráfica", "📝 Representación textual"])
+            with tab1:
+                try:
+                    dot = tree_to_dot(root, **caps)
+                    st.graphviz_chart(dot)
+                except Exception as e:
+                    st.warning(f"No se pudo renderizar el árbol como gráfico: {e}")
+                    st.code(tree_to_pretty_text(root, **caps))
+                st.download_button("⬇️ Descargar árbol completo (DOT)", data=tree_to_dot(root), file_name="arbol.dot")
+            with tab2:
+                st.code(tree_to_pretty_text(root, **caps))
+        else:
+            st.error("❌ No se pudo construir el árbol (cadena rechazada)")
+            if recover_errors:
+                rkey = (sync_tokens, int(repair_cost))
+                if parsed.get("recovery_key") != rkey:
+                    parsed["recovery_key"] = rkey
+                    parsed["recovery"] = analizar_errores(input_str, ACTION, GOTO, augmented, sync=sync_tokens.split() or None,
+                                                          repair=repair_cost > 0, max_cost=int(repair_cost))
+                err_df, recovery = parsed["recovery"]
+                st.subheader(f"🩹 Errores sintácticos ({len(recovery.errors)})")
+                st.dataframe(err_df, use_container_width=True, hide_index=True)
+                if recovery.completed:
+                    st.caption("Con las reparaciones indicadas la cadena se analiza hasta el final.")
+
+    except ValueError as e:
+        st.error(f"❌ **Error en la gramática:** {str(e)}")
+    except Exception as e:
+        st.error(f"❌ **Error inesperado:** {str(e)}")
+        with st.expander("🐛 Detalles del error"):
+            st.exception(e)
 
 st.markdown("---")
 st.caption("""
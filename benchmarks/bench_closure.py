@@ -0,0 +1,46 @@
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grammar import parse_grammar_text, first_sets, first_of_seq, EPS
+from lr1_items import LR1Context, canonical_collection, closure
+from corpus import expression_grammar
+
+def closure_naive(kernel, ctx, FIRST):
+    items = dict(kernel)
+    work = list(items)
+    while work:
+        core = work.pop()
+        pidx, dot = core
+        B = ctx.aug[pidx][1]
+        if dot < len(B) and B[dot] in ctx.nonterminals:
+            first = first_of_seq(B[dot + 1:], FIRST)
+            looks = items[core] if EPS in first else 0
+            for a in first:
+                if a != EPS:
+                    looks |= ctx.term_bit[a]
+            for (qidx, _, _) in ctx.by_head[B[dot]]:
+                old = items.get((qidx, 0), 0)
+                if looks | old != old:
+                    items[(qidx, 0)] = looks | old
+                    work.append((qidx, 0))
+    return items
+
+def main(levels: int = 8, ops_per_level: int = 4, repeat: int = 5):
+    prods, start, nts, ts = parse_grammar_text(expression_grammar(levels, ops_per_level))
+    FIRST = first_sets(nts, ts, prods)
+    C = canonical_collection(prods, start, FIRST, ts, nts)[0]
+    ctx = LR1Context(prods, start, FIRST, ts, nts)
+    kernels = [dict(I.kernel) for I in C]
+    for k in kernels:
+        assert closure(k, ctx) == closure_naive(k, ctx, FIRST)
+    print(f"{len(prods)} producciones, {len(ts)} terminales, {len(kernels)} kernels")
+    for name, fn in (("tabla", lambda: [closure(k, ctx) for k in kernels]),
+                     ("first_of_seq", lambda: [closure_naive(k, ctx, FIRST) for k in kernels])):
+        best = min(timeit.repeat(fn, number=1, repeat=repeat))
+        print(f"closure {name:>12}: {best * 1000:8.2f} ms")
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,62 @@
+import importlib.util
+import os
+import random
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grammar import parse_grammar_text, first_sets
+from parser_tables import build_tables
+from lr_driver import parse_tokens
+from codegen import write_module
+from corpus import expression_grammar
+
+def load(path: str, name: str):
+    spec = importlib.util.spec_from_file_location(name, path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+def random_expr(levels: int, ops_per_level: int, n: int, rng: random.Random):
+    out = []
+    for _ in range(n):
+        out.append(rng.choice(["id", "num"]))
+        i = rng.randrange(levels)
+        out.append(f"o{i}_{rng.randrange(ops_per_level)}")
+    out.append("id")
+    return out
+
+def main(levels: int = 8, ops_per_level: int = 4, ntokens: int = 200000, repeat: int = 3):
+    prods, start, nts, ts = parse_grammar_text(expression_grammar(levels, ops_per_level))
+    FIRST = first_sets(nts, ts, prods)
+    t0 = time.perf_counter()
+    ACTION, _, C, aug, _ = build_tables(prods, start, ts, nts, FIRST, mode="lalr")
+    build = time.perf_counter() - t0
+    tables = ACTION.tables
+    tokens = random_expr(levels, ops_per_level, ntokens // 2, random.Random(0))
+    print(f"{len(prods)} producciones, {len(C)} estados, {len(tokens)} tokens")
+    print(f"{'build_tables':>22}: {build * 1000:8.2f} ms")
+    with tempfile.TemporaryDirectory() as d:
+        runs = [("parse_tokens", lambda: parse_tokens(tokens, tables).accepted)]
+        for name, dispatch in (("tablas", False), ("despacho", True)):
+            path = os.path.join(d, f"gen_{name}.py")
+            write_module(path, tables, aug, dispatch)
+            t0 = time.perf_counter()
+            load(path, f"gen_{name}")
+            cold = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            mod = load(path, f"gen_{name}")
+            warm = time.perf_counter() - t0
+            print(f"{'import ' + name:>22}: {cold * 1000:8.2f} ms (compilando), {warm * 1000:8.2f} ms (.pyc)"
+                  f" · {os.path.getsize(path) // 1024} KiB")
+            runs.append((name, lambda mod=mod: mod.parse(tokens)[0]))
+        for name, fn in runs:
+            assert fn()
+            best = min(timeit.repeat(fn, number=1, repeat=repeat))
+            print(f"{'parse ' + name:>22}: {best * 1000:8.2f} ms ({len(tokens) / best / 1e6:.2f} Mtok/s)")
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
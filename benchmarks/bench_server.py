@@ -0,0 +1,131 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grammar import parse_grammar_text
+from lr1_server import GrammarPool, serve
+from corpus import CORPUS, sample_sentences
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def start_local_server():
+    ready = threading.Event()
+    where = {}
+
+    def on_ready(srv):
+        where["port"] = srv.sockets[0].getsockname()[1]
+        ready.set()
+
+    t = threading.Thread(target=lambda: asyncio.run(serve("127.0.0.1", 0, pool=GrammarPool(cache=None), ready=on_ready)),
+                         daemon=True)
+    t.start()
+    if not ready.wait(30):
+        raise RuntimeError("el servidor no arrancó")
+    return "127.0.0.1", where["port"]
+
+async def request(reader, writer, req):
+    writer.write(json.dumps(req).encode("utf-8") + b"\n")
+    await writer.drain()
+    out = json.loads(await reader.readline())
+    if not out.get("ok"):
+        raise RuntimeError(out.get("error"))
+    return out
+
+async def client(host, port, grammar_hash, sentences, tree, latencies):
+    reader, writer = await asyncio.open_connection(host, port, limit=16 << 20)
+    accepted = 0
+    try:
+        for s in sentences:
+            t0 = time.perf_counter()
+            out = await request(reader, writer, {"op": "parse", "hash": grammar_hash, "tokens": s, "tree": tree})
+            latencies.append(time.perf_counter() - t0)
+            accepted += out["accepted"]
+    finally:
+        writer.close()
+        await writer.wait_closed()
+    return accepted
+
+def percentile(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(p / 100 * len(xs)))] if xs else 0.0
+
+async def run(host, port, text, sentences, clients, tree):
+    reader, writer = await asyncio.open_connection(host, port, limit=16 << 20)
+    t0 = time.perf_counter()
+    out = await request(reader, writer, {"op": "load", "grammar": text})
+    cold = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    await request(reader, writer, {"op": "load", "grammar": text})
+    warm = time.perf_counter() - t0
+    writer.close()
+    await writer.wait_closed()
+    print(f"{'load (fría)':>22}: {cold * 1000:8.2f} ms · {out['states']} estados")
+    print(f"{'load (en memoria)':>22}: {warm * 1000:8.2f} ms")
+    latencies = []
+    t0 = time.perf_counter()
+    accepted = await asyncio.gather(*(client(host, port, out["hash"], sentences[i::clients], tree, latencies)
+                                      for i in range(clients)))
+    wall = time.perf_counter() - t0
+    ntokens = sum(map(len, sentences))
+    print(f"{'parse':>22}: {len(sentences)} peticiones, {clients} clientes, {sum(accepted)} aceptadas, "
+          f"{len(sentences) / wall:,.0f} pet/s, {ntokens / wall:,.0f} tokens/s")
+    print(f"{'latencia':>22}: p50 {percentile(latencies, 50) * 1000:.2f} ms, "
+          f"p99 {percentile(latencies, 99) * 1000:.2f} ms, máx {max(latencies) * 1000:.2f} ms")
+
+def cli_baseline(text, sentences, n):
+    with tempfile.TemporaryDirectory() as d:
+        gpath = os.path.join(d, "gramatica.txt")
+        with open(gpath, "w", encoding="utf-8") as f:
+            f.write(text)
+        times = []
+        for s in sentences[:n]:
+            ipath = os.path.join(d, "entrada.txt")
+            with open(ipath, "w", encoding="utf-8") as f:
+                f.write(" ".join(s))
+            t0 = time.perf_counter()
+            subprocess.run([sys.executable, os.path.join(ROOT, "lr1_cli.py"), "parse", gpath, ipath, "--no-cache"],
+                           capture_output=True, check=False)
+            times.append(time.perf_counter() - t0)
+    print(f"{'lr1_cli.py parse':>22}: p50 {percentile(times, 50) * 1000:.2f} ms por petición "
+          f"(proceso nuevo y tablas construidas cada vez, {len(times)} peticiones)")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Prueba de carga del servidor de análisis: latencia y rendimiento con varios clientes.")
+    ap.add_argument("--grammar", default="expr_8x4", help="nombre de una gramática del corpus")
+    ap.add_argument("--host", default=None, help="servidor ya arrancado; por defecto se arranca uno en este proceso")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--tokens", type=int, default=40, help="tokens aproximados por petición")
+    ap.add_argument("--clients", type=int, default=8)
+    ap.add_argument("--tree", action="store_true", help="pide el árbol en cada respuesta")
+    ap.add_argument("--cli", type=int, default=0, help="además, mide N llamadas a lr1_cli.py como referencia")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    matches = [args.grammar] if args.grammar in CORPUS else [name for name in CORPUS if args.grammar in name]
+    if not matches:
+        ap.error(f"gramática desconocida: {args.grammar} (disponibles: {', '.join(CORPUS)})")
+    text = CORPUS[matches[0]]()
+    prods, start, _, _ = parse_grammar_text(text)
+    rng = random.Random(args.seed)
+    sentences = []
+    while len(sentences) < args.requests:
+        sentences += sample_sentences(prods, start, args.tokens * 50, rng, max_len=args.tokens)
+    sentences = sentences[:args.requests]
+    host, port = (args.host, args.port) if args.host else start_local_server()
+    print(f"{matches[0]}: {len(prods)} producciones, servidor en {host}:{port}")
+    asyncio.run(run(host, port, text, sentences, args.clients, args.tree))
+    if args.cli:
+        cli_baseline(text, sentences, args.cli)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grammar import parse_grammar_text, parse_precedence, first_sets, follow_sets
+from lr1_items import canonical_collection
+from parser_tables import build_tables, MODES
+from compiled_tables import compile_tables
+from lr_driver import parse_tokens
+from corpus import CORPUS, sample_sentences
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def measure(fn, repeat: int, memory: bool):
+    best = float("inf")
+    value = None
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        value = fn()
+        best = min(best, time.perf_counter() - t0)
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    row = {"seconds": best}
+    if peak is not None:
+        row["peak_kib"] = peak // 1024
+    return row, value
+
+def bench_grammar(name, text, modes, driver_mode, ntokens, repeat, memory, seed):
+    prods, start, nts, ts = parse_grammar_text(text)
+    precedence = parse_precedence(text)
+    phases = {}
+    phases["first_sets"], FIRST = measure(lambda: first_sets(nts, ts, prods), repeat, memory)
+    phases["follow_sets"], _ = measure(lambda: follow_sets(nts, ts, prods, start, FIRST), repeat, memory)
+    phases["canonical_collection"], _ = measure(lambda: canonical_collection(prods, start, FIRST, ts, nts), repeat, memory)
+    states, conflicts, built = {}, {}, {}
+    for mode in modes:
+        phases[f"build_tables[{mode}]"], built[mode] = measure(
+            lambda: build_tables(prods, start, ts, nts, FIRST, mode=mode, precedence=precedence), repeat, memory)
+        ACTION, GOTO, C, aug, _ = built[mode]
+        ACTION, GOTO = dict(ACTION), dict(GOTO)
+        phases[f"compile_tables[{mode}]"], _ = measure(
+            lambda: compile_tables(ACTION, GOTO, aug, nstates=len(C)), repeat, memory)
+        states[mode] = len(built[mode][2])
+        conflicts[mode] = len(built[mode][4])
+    out = {
+        "grammar": name,
+        "productions": len(prods),
+        "nonterminals": len(nts),
+        "terminals": len(ts),
+        "states": states,
+        "conflicts": conflicts,
+        "phases": phases,
+    }
+    if driver_mode in built:
+        sentences = sample_sentences(prods, start, ntokens, random.Random(seed))
+        out["driver"] = {"sentences": len(sentences), "tokens": sum(map(len, sentences))}
+        unit_tables = build_tables(prods, start, ts, nts, FIRST, mode=driver_mode, precedence=precedence,
+                                   unit_elim=True)[0].tables
+        for label, tables in (("parse", built[driver_mode][0].tables), ("parse_unit_elim", unit_tables)):
+            def run():
+                results = [parse_tokens(s, tables) for s in sentences]
+                return sum(r.accepted for r in results), sum(r.pos for r in results), sum(r.steps for r in results)
+            phase_name = f"{label}[{driver_mode}]"
+            phases[phase_name], (accepted, consumed, steps) = measure(run, repeat, memory)
+            out["driver"][label] = {
+                "accepted": accepted,
+                "tokens_consumed": consumed,
+                "tokens_per_second": consumed / phases[phase_name]["seconds"],
+                "steps_per_token": steps / max(consumed, 1),
+            }
+    return out
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def compare(old, new, threshold: float, min_seconds: float) -> int:
+    before = {(r["grammar"], p): v["seconds"] for r in old["results"] for p, v in r["phases"].items()}
+    worse = 0
+    print(f"\n{'gramática':<34} {'fase':<24} {'antes':>10} {'ahora':>10} {'razón':>7}")
+    for r in new["results"]:
+        for p, v in r["phases"].items():
+            a = before.get((r["grammar"], p))
+            if a is None:
+                continue
+            ratio = v["seconds"] / a if a else float("inf")
+            flag = ""
+            if ratio > 1 + threshold and v["seconds"] - a > min_seconds:
+                flag = "  ← regresión"
+                worse += 1
+            print(f"{r['grammar'][:34]:<34} {p:<24} {a * 1000:8.2f}ms {v['seconds'] * 1000:8.2f}ms {ratio:6.2f}x{flag}")
+    return worse
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Mide FIRST/FOLLOW, colección canónica, construcción de tablas y el driver LR sobre un corpus de gramáticas.")
+    ap.add_argument("--only", nargs="*", default=None, help="subcadenas de los nombres de gramática a medir")
+    ap.add_argument("--modes", nargs="*", choices=list(MODES), default=list(MODES))
+    ap.add_argument("--driver-mode", choices=list(MODES), default="lalr")
+    ap.add_argument("--tokens", type=int, default=50000, help="tokens de entrada para el driver por gramática")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--no-memory", action="store_true", help="no medir el pico de memoria con tracemalloc")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--compare", default=None, help="resultados previos (JSON) contra los que comparar")
+    ap.add_argument("--threshold", type=float, default=0.10, help="empeoramiento relativo que cuenta como regresión")
+    ap.add_argument("--min-ms", type=float, default=1.0, help="diferencia absoluta mínima (ms) para contar una regresión")
+    args = ap.parse_args(argv)
+    results = []
+    for name, source in CORPUS.items():
+        if args.only and not any(s in name for s in args.only):
+            continue
+        t0 = time.perf_counter()
+        r = bench_grammar(name, source(), args.modes, args.driver_mode, args.tokens, args.repeat,
+                          not args.no_memory, args.seed)
+        results.append(r)
+        states = ", ".join(f"{m}={n}" for m, n in r["states"].items())
+        print(f"{name[:34]:<34} {states:<40} {time.perf_counter() - t0:6.2f}s", file=sys.stderr)
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print(f"resultados en {args.out}", file=sys.stderr)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            return 1 if compare(json.load(f), report, args.threshold, args.min_ms / 1000) else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
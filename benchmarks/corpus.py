@@ -0,0 +1,219 @@
+import os
+import random
+import sys
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from examples import EXAMPLES
+
+JSON = """value -> object | array | string | number | true | false | null
+object -> { } | { members }
+members -> pair | members , pair
+pair -> string : value
+array -> [ ] | [ elements ]
+elements -> value | elements , value"""
+
+# Subconjunto de ANSI C sin nombres de typedef. Los operadores que chocan con la
+# sintaxis de las gramáticas se renombran: -> es arrow, | es bar, || es oror y |= es or_assign.
+C_SUBSET = """translation_unit -> external_declaration | translation_unit external_declaration
+external_declaration -> function_definition | declaration
+function_definition -> declaration_specifiers declarator compound_statement
+declaration -> declaration_specifiers ; | declaration_specifiers init_declarator_list ;
+declaration_specifiers -> storage_class_specifier | storage_class_specifier declaration_specifiers | type_specifier | type_specifier declaration_specifiers | type_qualifier | type_qualifier declaration_specifiers
+init_declarator_list -> init_declarator | init_declarator_list , init_declarator
+init_declarator -> declarator | declarator = initializer
+storage_class_specifier -> typedef | extern | static | auto | register
+type_specifier -> void | char | short | int | long | float | double | signed | unsigned | struct_or_union_specifier | enum_specifier
+struct_or_union_specifier -> struct_or_union id { struct_declaration_list } | struct_or_union { struct_declaration_list } | struct_or_union id
+struct_or_union -> struct | union
+struct_declaration_list -> struct_declaration | struct_declaration_list struct_declaration
+struct_declaration -> specifier_qualifier_list struct_declarator_list ;
+specifier_qualifier_list -> type_specifier specifier_qualifier_list | type_specifier | type_qualifier specifier_qualifier_list | type_qualifier
+struct_declarator_list -> struct_declarator | struct_declarator_list , struct_declarator
+struct_declarator -> declarator | : constant_expression | declarator : constant_expression
+enum_specifier -> enum { enumerator_list } | enum id { enumerator_list } | enum id
+enumerator_list -> enumerator | enumerator_list , enumerator
+enumerator -> id | id = constant_expression
+type_qualifier -> const | volatile
+declarator -> pointer direct_declarator | direct_declarator
+direct_declarator -> id | ( declarator ) | direct_declarator [ constant_expression ] | direct_declarator [ ] | direct_declarator ( parameter_type_list ) | direct_declarator ( )
+pointer -> * | * type_qualifier_list | * pointer | * type_qualifier_list pointer
+type_qualifier_list -> type_qualifier | type_qualifier_list type_qualifier
+parameter_type_list -> parameter_list | parameter_list , ...
+parameter_list -> parameter_declaration | parameter_list , parameter_declaration
+parameter_declaration -> declaration_specifiers declarator | declaration_specifiers abstract_declarator | declaration_specifiers
+type_name -> specifier_qualifier_list | specifier_qualifier_list abstract_declarator
+abstract_declarator -> pointer | direct_abstract_declarator | pointer direct_abstract_declarator
+direct_abstract_declarator -> ( abstract_declarator ) | [ ] | [ constant_expression ] | direct_abstract_declarator [ ] | direct_abstract_declarator [ constant_expression ] | ( ) | ( parameter_type_list ) | direct_abstract_declarator ( ) | direct_abstract_declarator ( parameter_type_list )
+initializer -> assignment_expression | { initializer_list } | { initializer_list , }
+initializer_list -> initializer | initializer_list , initializer
+statement -> labeled_statement | compound_statement | expression_statement | selection_statement | iteration_statement | jump_statement
+labeled_statement -> id : statement | case constant_expression : statement | default : statement
+compound_statement -> { } | { statement_list } | { declaration_list } | { declaration_list statement_list }
+declaration_list -> declaration | declaration_list declaration
+statement_list -> statement | statement_list statement
+expression_statement -> ; | expression ;
+selection_statement -> if ( expression ) statement | if ( expression ) statement else statement | switch ( expression ) statement
+iteration_statement -> while ( expression ) statement | do statement while ( expression ) ; | for ( expression_statement expression_statement ) statement | for ( expression_statement expression_statement expression ) statement
+jump_statement -> goto id ; | continue ; | break ; | return ; | return expression ;
+expression -> assignment_expression | expression , assignment_expression
+assignment_expression -> conditional_expression | unary_expression assignment_operator assignment_expression
+assignment_operator -> = | *= | /= | %= | += | -= | <<= | >>= | &= | ^= | or_assign
+constant_expression -> conditional_expression
+conditional_expression -> logical_or_expression | logical_or_expression ? expression : conditional_expression
+logical_or_expression -> logical_and_expression | logical_or_expression oror logical_and_expression
+logical_and_expression -> inclusive_or_expression | logical_and_expression && inclusive_or_expression
+inclusive_or_expression -> exclusive_or_expression | inclusive_or_expression bar exclusive_or_expression
+exclusive_or_expression -> and_expression | exclusive_or_expression ^ and_expression
+and_expression -> equality_expression | and_expression & equality_expression
+equality_expression -> relational_expression | equality_expression == relational_expression | equality_expression != relational_expression
+relational_expression -> shift_expression | relational_expression < shift_expression | relational_expression > shift_expression | relational_expression <= shift_expression | relational_expression >= shift_expression
+shift_expression -> additive_expression | shift_expression << additive_expression | shift_expression >> additive_expression
+additive_expression -> multiplicative_expression | additive_expression + multiplicative_expression | additive_expression - multiplicative_expression
+multiplicative_expression -> cast_expression | multiplicative_expression * cast_expression | multiplicative_expression / cast_expression | multiplicative_expression % cast_expression
+cast_expression -> unary_expression | ( type_name ) cast_expression
+unary_expression -> postfix_expression | ++ unary_expression | -- unary_expression | unary_operator cast_expression | sizeof unary_expression | sizeof ( type_name )
+unary_operator -> & | * | + | - | ~ | !
+postfix_expression -> primary_expression | postfix_expression [ expression ] | postfix_expression ( ) | postfix_expression ( argument_expression_list ) | postfix_expression . id | postfix_expression arrow id | postfix_expression ++ | postfix_expression --
+argument_expression_list -> assignment_expression | argument_expression_list , assignment_expression
+primary_expression -> id | constant | string_literal | ( expression )"""
+
+SQL_SUBSET = """sql -> stmt ; | sql stmt ;
+stmt -> select_stmt | insert_stmt | update_stmt | delete_stmt | create_stmt
+select_stmt -> select_core | select_stmt UNION select_core | select_stmt UNION ALL select_core
+select_core -> SELECT opt_distinct select_list | SELECT opt_distinct select_list FROM table_refs opt_where opt_group opt_having opt_order opt_limit
+opt_distinct -> DISTINCT | ε
+select_list -> * | select_items
+select_items -> select_item | select_items , select_item
+select_item -> expr | expr AS id | expr id
+table_refs -> table_ref | table_refs , table_ref
+table_ref -> table_primary | table_ref join_type JOIN table_primary ON expr
+table_primary -> id | id id | id AS id | ( select_stmt ) AS id
+join_type -> ε | INNER | LEFT | LEFT OUTER | RIGHT | RIGHT OUTER
+opt_where -> WHERE expr | ε
+opt_group -> GROUP BY expr_list | ε
+opt_having -> HAVING expr | ε
+opt_order -> ORDER BY order_list | ε
+order_list -> order_item | order_list , order_item
+order_item -> expr | expr ASC | expr DESC
+opt_limit -> LIMIT num | LIMIT num OFFSET num | ε
+expr_list -> expr | expr_list , expr
+expr -> or_expr
+or_expr -> and_expr | or_expr OR and_expr
+and_expr -> not_expr | and_expr AND not_expr
+not_expr -> cmp_expr | NOT not_expr
+cmp_expr -> add_expr | add_expr cmp_op add_expr | add_expr IS NULL | add_expr IS NOT NULL | add_expr IN ( expr_list ) | add_expr IN ( select_stmt ) | add_expr BETWEEN add_expr AND add_expr | add_expr LIKE str | EXISTS ( select_stmt )
+cmp_op -> = | <> | < | > | <= | >=
+add_expr -> mul_expr | add_expr + mul_expr | add_expr - mul_expr
+mul_expr -> unary | mul_expr * unary | mul_expr / unary
+unary -> primary | - unary
+primary -> column | num | str | NULL | ( expr ) | ( select_stmt ) | id ( ) | id ( expr_list ) | id ( * ) | CASE when_list opt_else END
+column -> id | id . id
+when_list -> WHEN expr THEN expr | when_list WHEN expr THEN expr
+opt_else -> ELSE expr | ε
+insert_stmt -> INSERT INTO id VALUES row_list | INSERT INTO id ( id_list ) VALUES row_list | INSERT INTO id select_stmt
+row_list -> ( expr_list ) | row_list , ( expr_list )
+id_list -> id | id_list , id
+update_stmt -> UPDATE id SET assign_list opt_where
+assign_list -> id = expr | assign_list , id = expr
+delete_stmt -> DELETE FROM id opt_where
+create_stmt -> CREATE TABLE id ( column_defs )
+column_defs -> column_def | column_defs , column_def
+column_def -> id type_name col_constraints
+type_name -> INT | INTEGER | TEXT | REAL | VARCHAR ( num ) | DECIMAL ( num , num )
+col_constraints -> ε | col_constraints col_constraint
+col_constraint -> PRIMARY KEY | NOT NULL | UNIQUE | DEFAULT primary"""
+
+def expression_grammar(levels: int, ops_per_level: int) -> str:
+    lines = []
+    for i in range(levels):
+        alts = [f"E{i} o{i}_{k} E{i + 1}" for k in range(ops_per_level)] + [f"E{i + 1}"]
+        lines.append(f"E{i} -> " + " | ".join(alts))
+    lines.append(f"E{levels} -> ( E0 ) | id | num")
+    return "\n".join(lines)
+
+def flat_expression_grammar(levels: int, ops_per_level: int) -> str:
+    lines = [f"%left " + " ".join(f"o{i}_{k}" for k in range(ops_per_level)) for i in range(levels)]
+    alts = [f"E o{i}_{k} E" for i in range(levels) for k in range(ops_per_level)]
+    lines.append("E -> " + " | ".join(alts + ["( E )", "id", "num"]))
+    return "\n".join(lines)
+
+def synthetic_grammar(nonterminals: int, alternatives: int, terminals: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    lines = []
+    for i in range(nonterminals):
+        alts = [f"t{rng.randrange(terminals)}"]
+        for _ in range(alternatives - 1):
+            body = []
+            if rng.random() < 0.3:
+                body.append(f"N{i}")
+            for _ in range(rng.randint(1, 3)):
+                if i + 1 < nonterminals and rng.random() < 0.5:
+                    body.append(f"N{rng.randrange(i + 1, nonterminals)}")
+                else:
+                    body.append(f"t{rng.randrange(terminals)}")
+            alts.append(" ".join(body))
+        lines.append(f"N{i} -> " + " | ".join(dict.fromkeys(alts)))
+    return "\n".join(lines)
+
+def sample_sentence(prods, start: str, ntokens: int, rng: random.Random) -> List[str]:
+    by_head: Dict[str, List[List[str]]] = {}
+    for H, B in prods:
+        by_head.setdefault(H, []).append(B)
+    cost = {H: float("inf") for H in by_head}
+    def body_cost(B):
+        return sum(cost.get(X, 1) for X in B)
+    changed = True
+    while changed:
+        changed = False
+        for H, bodies in by_head.items():
+            c = min(body_cost(B) for B in bodies)
+            if c < cost[H]:
+                cost[H] = c
+                changed = True
+    out: List[str] = []
+    stack = [start]
+    need = cost[start]
+    while stack:
+        X = stack.pop()
+        if X not in by_head:
+            out.append(X)
+            need -= 1
+            continue
+        need -= cost[X]
+        slack = ntokens - len(out) - need
+        options = [B for B in by_head[X] if body_cost(B) <= slack]
+        if not options:
+            options = [min(by_head[X], key=body_cost)]
+        B = rng.choices(options, [1 + 3 * sum(Y in by_head for Y in opt) for opt in options])[0]
+        need += body_cost(B)
+        stack.extend(reversed(B))
+    return out
+
+def sample_sentences(prods, start: str, ntokens: int, rng: random.Random, max_len: int = 5000) -> List[List[str]]:
+    out: List[List[str]] = []
+    total = 0
+    for _ in range(1000):
+        if total >= ntokens:
+            break
+        sent = sample_sentence(prods, start, min(max_len, ntokens - total), rng)
+        out.append(sent)
+        total += len(sent)
+    return out
+
+GrammarSource = Callable[[], str]
+
+CORPUS: Dict[str, GrammarSource] = {
+    **{f"ejemplo: {name}": (lambda txt=txt: txt) for name, txt in EXAMPLES.items()},
+    "json": lambda: JSON,
+    "c_subset": lambda: C_SUBSET,
+    "sql_subset": lambda: SQL_SUBSET,
+    "expr_8x4": lambda: expression_grammar(8, 4),
+    "expr_16x6": lambda: expression_grammar(16, 6),
+    "expr_plana_8x4": lambda: flat_expression_grammar(8, 4),
+    "expr_plana_16x6": lambda: flat_expression_grammar(16, 6),
+    "sint_20x4x10": lambda: synthetic_grammar(20, 4, 10),
+    "sint_60x5x30": lambda: synthetic_grammar(60, 5, 30),
+    "sint_100x5x40": lambda: synthetic_grammar(100, 5, 40),
+}
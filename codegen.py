@@ -0,0 +1,225 @@
+import argparse
+import sys
+from array import array
+from collections import defaultdict
+from typing import Dict, List, Tuple
+from compiled_tables import CompiledTables, ARRAY_FIELDS
+
+HEADER = '''# Módulo generado por codegen.py ({kind}) — no editar a mano.
+# Analizador LR autocontenido: solo depende de la biblioteca estándar.
+import sys
+from array import array
+from itertools import chain
+
+END = {end!r}
+TERMS = {terms!r}
+NONTERMS = {nonterms!r}
+PRODUCTIONS = {prods!r}
+ACCEPT = {accept}
+'''
+
+TABLE_DATA = '''
+_LENS = {lens!r}
+_DEFMASK = {defmask}
+_BLOB = (
+{blob}
+)
+
+def _load():
+    mv = memoryview(_BLOB)
+    out = []
+    off = 0
+    for n in _LENS:
+        if sys.byteorder == "little":
+            a = mv[off:off + 4 * n].cast("i")
+        else:
+            a = array("i")
+            a.frombytes(mv[off:off + 4 * n])
+            a.byteswap()
+        out.append(a)
+        off += 4 * n
+    return out
+
+{fields} = _load()
+'''
+
+TABLE_SETUP = '''    base, table, check, defred, defmask = _base, _table, _check, _defred, _DEFMASK
+    gbase, gtable, gcheck = _gbase, _gtable, _gcheck
+    prod_lhs, prod_len = _prod_lhs, _prod_len'''
+
+TABLE_ACTION = '''        if t < 0:
+            act = 0
+        else:
+            i = base[s] + t
+            if check[i] == s:
+                act = table[i]
+            elif defmask[s] >> t & 1:
+                act = defred[s]
+            else:
+                act = 0'''
+
+TABLE_GOTO = '''            s2 = stack[-1]
+            j = gbase[s2] + prod_lhs[p]
+            if gcheck[j] != s2:
+                return False, pos, tok
+            g = gtable[j]'''
+
+DISPATCH_SETUP = '''    action, goto = _ACTION, _GOTO
+    prod_lhs, prod_len = _PROD_LHS, _PROD_LEN'''
+
+DISPATCH_ACTION = '''        act = action[s](t)'''
+
+DISPATCH_GOTO = '''            g = goto[prod_lhs[p]](stack[-1])
+            if g < 0:
+                return False, pos, tok'''
+
+DRIVER = '''
+TERM_ID = {{t: i for i, t in enumerate(TERMS)}}
+
+def parse(tokens, on_reduce=None):
+{setup}
+    term_id = TERM_ID
+    it = chain(tokens, (END,))
+    tok = next(it)
+    t = term_id.get(tok, -1)
+    stack = [0]
+    starts = [0] if on_reduce is not None else None
+    pos = 0
+    while True:
+        s = stack[-1]
+{action}
+        if act > 0:
+            stack.append(act - 1)
+            if starts is not None:
+                starts.append(pos)
+            pos += 1
+            tok = next(it)
+            t = term_id.get(tok, -1)
+        elif act == 0:
+            return False, pos, tok
+        elif act == ACCEPT:
+            return True, pos, None
+        else:
+            p = -act - 1
+            k = prod_len[p]
+            if k:
+                del stack[-k:]
+{goto}
+            stack.append(g)
+            if starts is not None:
+                start = starts[-k] if k else pos
+                if k:
+                    del starts[-k:]
+                starts.append(start)
+                on_reduce(p, start, pos)
+{units}'''
+
+UNIT_REPLAY = '''                for units, mask in _UNIT_CHAINS.get((stack[-2], prod_lhs[p]), ()):
+                    if mask >> t & 1:
+                        for u in units:
+                            on_reduce(u, start, pos)
+                        break
+'''
+
+def _blob_literal(data: bytes, width: int = 48) -> str:
+    return "\n".join(f"    {data[i:i + width]!r}" for i in range(0, len(data), width)) or "    b''"
+
+def _branches(arg: str, cases: Dict[int, List[int]], default: int) -> List[str]:
+    lines = []
+    for v, keys in sorted(cases.items(), key=lambda kv: (-len(kv[1]), kv[0])):
+        if v == default:
+            continue
+        test = f"{arg} == {keys[0]}" if len(keys) == 1 else f"{arg} in {{{', '.join(map(str, sorted(keys)))}}}"
+        lines += [f"    if {test}:", f"        return {v}"]
+    lines.append(f"    return {default}")
+    return lines
+
+def _dispatch_code(T: CompiledTables) -> str:
+    out = []
+    for s in range(T.nstates):
+        cases: Dict[int, List[int]] = defaultdict(list)
+        for t in range(len(T.terms)):
+            v = T.action_code(s, t)
+            if v:
+                cases[v].append(t)
+        out.append(f"def _a{s}(t):")
+        out += _branches("t", cases, 0)
+        out.append("")
+    for A in range(len(T.nonterms)):
+        cases = defaultdict(list)
+        for s in range(T.nstates):
+            g = T.goto_state(s, A)
+            if g >= 0:
+                cases[g].append(s)
+        out.append(f"def _g{A}(s):")
+        out += _branches("s", cases, -1)
+        out.append("")
+    out.append(f"_ACTION = ({''.join(f'_a{s}, ' for s in range(T.nstates))})")
+    out.append(f"_GOTO = ({''.join(f'_g{A}, ' for A in range(len(T.nonterms)))})")
+    out.append(f"_PROD_LHS = {tuple(T.prod_lhs)!r}")
+    out.append(f"_PROD_LEN = {tuple(T.prod_len)!r}")
+    return "\n" + "\n".join(out) + "\n"
+
+def _little_endian(a) -> bytes:
+    b = array("i", a)
+    if sys.byteorder != "little":
+        b.byteswap()
+    return b.tobytes()
+
+def _table_code(T: CompiledTables) -> str:
+    arrays = [getattr(T, f) for f in ARRAY_FIELDS]
+    blob = b"".join(_little_endian(a) for a in arrays)
+    return TABLE_DATA.format(
+        lens=tuple(len(a) for a in arrays),
+        defmask="(" + "".join(f"{hex(m)}, " for m in T.defmask) + ")",
+        blob=_blob_literal(blob),
+        fields=", ".join(f"_{f}" for f in ARRAY_FIELDS),
+    )
+
+def generate_module(tables: CompiledTables, aug, dispatch: bool = False) -> str:
+    T = tables
+    prods: List[Tuple[str, Tuple[str, ...]]] = [(H, tuple(B)) for H, B in aug]
+    src = HEADER.format(kind="despacho por estado" if dispatch else "tablas empaquetadas",
+                        end=T.terms[-1], terms=list(T.terms), nonterms=list(T.nonterms),
+                        prods=prods, accept=T.accept)
+    units = ""
+    if T.unit_chains:
+        src += f"\n_UNIT_CHAINS = {dict(sorted(T.unit_chains.items()))!r}\n"
+        units = UNIT_REPLAY
+    if dispatch:
+        src += _dispatch_code(T)
+        src += DRIVER.format(setup=DISPATCH_SETUP, action=DISPATCH_ACTION, goto=DISPATCH_GOTO, units=units)
+    else:
+        src += _table_code(T)
+        src += DRIVER.format(setup=TABLE_SETUP, action=TABLE_ACTION, goto=TABLE_GOTO, units=units)
+    return src
+
+def write_module(path: str, tables: CompiledTables, aug, dispatch: bool = False) -> str:
+    src = generate_module(tables, aug, dispatch)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(src)
+    return path
+
+def main(argv=None):
+    from grammar import parse_grammar_text, parse_precedence
+    from parser_tables import MODES
+    from parser_lr1 import build_parser
+    ap = argparse.ArgumentParser(description="Genera un módulo Python autocontenido con el analizador LR de una gramática.")
+    ap.add_argument("grammar", help="archivo con la gramática")
+    ap.add_argument("output", help="archivo .py de salida")
+    ap.add_argument("--mode", choices=list(MODES), default="canonical")
+    ap.add_argument("--dispatch", action="store_true", help="genera código por estado en lugar de tablas")
+    args = ap.parse_args(argv)
+    with open(args.grammar, encoding="utf-8") as f:
+        text = f.read()
+    prods, start, nts, ts = parse_grammar_text(text)
+    ACTION, _, states, aug, conflicts = build_parser(prods, start, nts, ts, mode=args.mode,
+                                                     precedence=parse_precedence(text))
+    for c in conflicts:
+        print(f"aviso: {c}", file=sys.stderr)
+    write_module(args.output, ACTION.tables, aug, args.dispatch)
+    print(f"{args.output}: {len(states)} estados, {MODES[args.mode]}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
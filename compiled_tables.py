@@ -0,0 +1,356 @@
+import json
+import struct
+import sys
+from array import array
+from collections import Counter
+from collections.abc import Mapping
+from typing import Dict, List, Optional, Tuple
+from grammar import END
+
+MAGIC = b"LR1T"
+FORMAT_VERSION = 3
+ARRAY_FIELDS = ("prod_lhs", "prod_len", "base", "table", "check", "defred", "gbase", "gtable", "gcheck")
+
+def _place(rows, order, width: int, base, table, check, used: int) -> int:
+    for s in order:
+        row = rows[s]
+        if not row:
+            continue
+        free = -1
+        mask = 0
+        for c, _ in row:
+            free &= ~(used >> c)
+            mask |= 1 << c
+        b = (free & -free).bit_length() - 1
+        used |= mask << b
+        if b + width > len(table):
+            grow = b + width - len(table)
+            table.extend([0] * grow)
+            check.extend([-1] * grow)
+        base[s] = b
+        for c, v in row:
+            table[b + c] = v
+            check[b + c] = s
+    return used
+
+def _comb(rows: List[List[Tuple[int, int]]], width: int):
+    order = sorted(range(len(rows)), key=lambda s: -len(rows[s]))
+    base = array("i", [0]) * len(rows)
+    table = array("i", [0]) * width
+    check = array("i", [-1]) * width
+    used = _place(rows, order, width, base, table, check, 0)
+    return base, table, check, used
+
+def _unplace(base, table, check, used: int, states, width: int):
+    base, table, check = array("i", base), array("i", table), array("i", check)
+    freed = 0
+    for s in states:
+        if s >= len(base):
+            continue
+        b = base[s]
+        for i in range(b, b + width):
+            if check[i] == s:
+                check[i] = -1
+                table[i] = 0
+                freed |= 1 << i
+        base[s] = 0
+    return base, table, check, used & ~freed
+
+def _used_mask(check) -> int:
+    return int("".join("1" if c >= 0 else "0" for c in reversed(check)) or "0", 2)
+
+def _resize(a, n: int, fill=0):
+    del a[n:]
+    a.extend([fill] * (n - len(a)))
+    return a
+
+class CompiledTables:
+    def __init__(self, terms, nonterms, prod_lhs, prod_len, base, table, check, defred, defmask, gbase, gtable, gcheck,
+                 multi=None, unit_chains=None, virtual=0):
+        self.terms: List[str] = terms
+        self.nonterms: List[str] = nonterms
+        self.term_id: Dict[str, int] = {t: i for i, t in enumerate(terms)}
+        self.nonterm_id: Dict[str, int] = {A: i for i, A in enumerate(nonterms)}
+        self.prod_lhs = prod_lhs
+        self.prod_len = prod_len
+        self.accept = -(len(prod_lhs) + 1)
+        self.nstates = len(base)
+        self.base, self.table, self.check = base, table, check
+        self.defred, self.defmask = defred, defmask
+        self.gbase, self.gtable, self.gcheck = gbase, gtable, gcheck
+        self.multi: Dict[Tuple[int, int], Tuple[int, ...]] = multi or {}
+        self.unit_chains: Dict[Tuple[int, int], Tuple[Tuple[Tuple[int, ...], int], ...]] = unit_chains or {}
+        self.virtual = virtual
+        self.action = ActionView(self)
+        self.goto = GotoView(self)
+        self._expected = None
+        self._used = None
+
+    def used_masks(self) -> Tuple[int, int]:
+        if self._used is None:
+            self._used = (_used_mask(self.check), _used_mask(self.gcheck))
+        return self._used
+
+    def action_code(self, s: int, t: int) -> int:
+        i = self.base[s] + t
+        if self.check[i] == s:
+            return self.table[i]
+        if self.defmask[s] >> t & 1:
+            return self.defred[s]
+        return 0
+
+    def goto_state(self, s: int, A: int) -> int:
+        i = self.gbase[s] + A
+        if self.gcheck[i] == s:
+            return self.gtable[i]
+        return -1
+
+    def actions(self, s: int, t: int) -> Tuple[int, ...]:
+        if self.multi:
+            m = self.multi.get((s, t))
+            if m is not None:
+                return m
+        v = self.action_code(s, t)
+        return (v,) if v else ()
+
+    def unit_chain(self, s: int, A: int, t: int) -> Tuple[int, ...]:
+        for chain, mask in self.unit_chains.get((s, A), ()):
+            if mask >> t & 1:
+                return chain
+        return ()
+
+    def expected_ids(self, s: int) -> Tuple[int, ...]:
+        if self._expected is None:
+            n = len(self.terms)
+            base, check, defmask = self.base, self.check, self.defmask
+            self._expected = [tuple(t for t in range(n) if check[base[q] + t] == q or defmask[q] >> t & 1)
+                              for q in range(self.nstates)]
+        return self._expected[s]
+
+    def expected(self, s: int) -> Tuple[str, ...]:
+        return tuple(self.terms[t] for t in self.expected_ids(s))
+
+    def decode(self, v: int):
+        if v > 0:
+            return ('shift', v - 1)
+        if v == self.accept:
+            return ('accept', 0)
+        return ('reduce', -v - 1)
+
+    def nbytes(self) -> int:
+        arrays = (self.prod_lhs, self.prod_len, self.base, self.table, self.check,
+                  self.defred, self.gbase, self.gtable, self.gcheck)
+        return sum(len(a) * a.itemsize for a in arrays) + sum((m.bit_length() + 7) // 8 for m in self.defmask)
+
+class ActionView(Mapping):
+    def __init__(self, tables: CompiledTables):
+        self.tables = tables
+
+    def __getitem__(self, key):
+        s, a = key
+        T = self.tables
+        t = T.term_id.get(a)
+        v = T.action_code(s, t) if t is not None and 0 <= s < T.nstates else 0
+        if not v:
+            raise KeyError(key)
+        return T.decode(v)
+
+    def __iter__(self):
+        T = self.tables
+        for s in range(T.nstates):
+            for t, a in enumerate(T.terms):
+                if T.action_code(s, t):
+                    yield (s, a)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+class GotoView(Mapping):
+    def __init__(self, tables: CompiledTables):
+        self.tables = tables
+
+    def __getitem__(self, key):
+        s, A = key
+        T = self.tables
+        n = T.nonterm_id.get(A)
+        g = T.goto_state(s, n) if n is not None and 0 <= s < T.nstates else -1
+        if g < 0:
+            raise KeyError(key)
+        return g
+
+    def __iter__(self):
+        T = self.tables
+        for s in range(T.nstates):
+            for n, A in enumerate(T.nonterms):
+                if T.goto_state(s, n) >= 0:
+                    yield (s, A)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+def table_symbols(aug) -> Tuple[List[str], List[str]]:
+    nonterms = sorted({H for H, _ in aug})
+    return sorted({X for _, B in aug for X in B} - set(nonterms)) + [END], nonterms
+
+def _encoder(accept: int):
+    def encode(act):
+        kind, arg = act
+        if kind == 'shift':
+            return arg + 1
+        if kind == 'reduce':
+            return -arg - 1
+        return accept
+    return encode
+
+def _default_reduction(row: List[Tuple[int, int]], accept: int):
+    counts = Counter(v for _, v in row if v < 0 and v != accept)
+    if not counts:
+        return row, 0, 0
+    v, n = counts.most_common(1)[0]
+    if n < 2:
+        return row, 0, 0
+    mask = 0
+    for t, w in row:
+        if w == v:
+            mask |= 1 << t
+    return [(t, w) for t, w in row if w != v], v, mask
+
+def _multi(conflicts, term_id, encode):
+    return {(s, term_id[a]): tuple(dict.fromkeys(encode(act) for act in acts))
+            for (s, a), acts in (conflicts or {}).items()}
+
+def compile_tables(ACTION, GOTO, aug, nstates=None, conflicts=None, unit_chains=None, virtual=0) -> CompiledTables:
+    terms, nonterms = table_symbols(aug)
+    term_id = {t: i for i, t in enumerate(terms)}
+    nonterm_id = {A: i for i, A in enumerate(nonterms)}
+    if nstates is None:
+        nstates = 1 + max([s for s, _ in ACTION] + [s for s, _ in GOTO] + [0])
+    accept = -(len(aug) + 1)
+    encode = _encoder(accept)
+    rows: List[List[Tuple[int, int]]] = [[] for _ in range(nstates)]
+    for (s, a), act in ACTION.items():
+        rows[s].append((term_id[a], encode(act)))
+    defred = array("i", [0]) * nstates
+    defmask = [0] * nstates
+    for s, row in enumerate(rows):
+        rows[s], defred[s], defmask[s] = _default_reduction(row, accept)
+    base, table, check, used = _comb(rows, len(terms))
+    grows: List[List[Tuple[int, int]]] = [[] for _ in range(nstates)]
+    for (s, A), j in GOTO.items():
+        grows[s].append((nonterm_id[A], j))
+    gbase, gtable, gcheck, gused = _comb(grows, len(nonterms))
+    prod_lhs = array("i", [nonterm_id[H] for H, _ in aug])
+    prod_len = array("i", [len(B) for _, B in aug])
+    chains = {}
+    for (s, A), alts in (unit_chains or {}).items():
+        chains[(s, nonterm_id[A])] = tuple((tuple(chain), sum(1 << term_id[a] for a in las)) for chain, las in alts)
+    tables = CompiledTables(terms, nonterms, prod_lhs, prod_len, base, table, check,
+                            defred, defmask, gbase, gtable, gcheck, _multi(conflicts, term_id, encode), chains, virtual)
+    tables._used = (used, gused)
+    return tables
+
+def update_tables(T: CompiledTables, ACTION, GOTO, aug, nstates: int, dirty, conflicts=None,
+                  remap: Optional[Dict[int, int]] = None) -> CompiledTables:
+    terms, nonterms = table_symbols(aug)
+    if terms != T.terms or T.unit_chains or T.virtual:
+        raise ValueError("update_tables necesita los mismos terminales y tablas sin estados virtuales")
+    term_id = T.term_id
+    nonterm_id = {A: i for i, A in enumerate(nonterms)}
+    accept = -(len(aug) + 1)
+    encode = _encoder(accept)
+    gone = set(dirty) | set(range(nstates, T.nstates))
+    used, gused = T.used_masks()
+    base, table, check, used = _unplace(T.base, T.table, T.check, used, gone, len(terms))
+    defred, defmask = array("i", T.defred), list(T.defmask)
+    for s in gone:
+        if s < len(defred):
+            defred[s] = defmask[s] = 0
+    if remap:
+        table = array("i", [remap.get(v, v) for v in table])
+        defred = array("i", [remap.get(v, v) for v in defred])
+    _resize(base, nstates)
+    _resize(defred, nstates)
+    _resize(defmask, nstates)
+    rows: Dict[int, List[Tuple[int, int]]] = {s: [] for s in dirty}
+    for (s, a), act in ACTION.items():
+        rows[s].append((term_id[a], encode(act)))
+    for s, row in rows.items():
+        rows[s], defred[s], defmask[s] = _default_reduction(row, accept)
+    used = _place(rows, sorted(rows, key=lambda s: -len(rows[s])), len(terms), base, table, check, used)
+    grows: Dict[int, List[Tuple[int, int]]] = {s: [] for s in dirty}
+    for (s, A), j in GOTO.items():
+        grows[s].append((nonterm_id[A], j))
+    if nonterms == T.nonterms:
+        gbase, gtable, gcheck, gused = _unplace(T.gbase, T.gtable, T.gcheck, gused, gone, len(nonterms))
+        _resize(gbase, nstates)
+        gused = _place(grows, sorted(grows, key=lambda s: -len(grows[s])), len(nonterms), gbase, gtable, gcheck, gused)
+    else:
+        full: List[List[Tuple[int, int]]] = []
+        for s in range(nstates):
+            if s in grows:
+                full.append(grows[s])
+            else:
+                full.append([(nonterm_id[A], g) for A, g in ((A, T.goto_state(s, n)) for n, A in enumerate(T.nonterms))
+                             if g >= 0])
+        gbase, gtable, gcheck, gused = _comb(full, len(nonterms))
+    prod_lhs = array("i", [nonterm_id[H] for H, _ in aug])
+    prod_len = array("i", [len(B) for _, B in aug])
+    tables = CompiledTables(terms, nonterms, prod_lhs, prod_len, base, table, check,
+                            defred, defmask, gbase, gtable, gcheck, _multi(conflicts, term_id, encode))
+    tables._used = (used, gused)
+    return tables
+
+def as_compiled(ACTION, GOTO, aug) -> CompiledTables:
+    tables = getattr(ACTION, "tables", None)
+    if isinstance(tables, CompiledTables):
+        return tables
+    return compile_tables(ACTION, GOTO, aug)
+
+def to_bytes(tables: CompiledTables, extra=None) -> bytes:
+    meta = {
+        "terms": tables.terms,
+        "nonterms": tables.nonterms,
+        "defmask": [format(m, "x") for m in tables.defmask],
+        "multi": [[s, t, list(codes)] for (s, t), codes in sorted(tables.multi.items())],
+        "unit_chains": [[s, A, [[list(chain), format(mask, "x")] for chain, mask in alts]]
+                        for (s, A), alts in sorted(tables.unit_chains.items())],
+        "virtual": tables.virtual,
+        "lens": [len(getattr(tables, f)) for f in ARRAY_FIELDS],
+        "byteorder": sys.byteorder,
+        "extra": extra,
+    }
+    head = json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    head += b" " * (-len(head) % 4)
+    parts = [MAGIC, struct.pack("<II", FORMAT_VERSION, len(head)), head]
+    for f in ARRAY_FIELDS:
+        parts.append(array("i", getattr(tables, f)).tobytes())
+    return b"".join(parts)
+
+def from_buffer(buf):
+    mv = memoryview(buf)
+    if bytes(mv[:4]) != MAGIC:
+        raise ValueError("No es una tabla LR compilada")
+    version, hlen = struct.unpack_from("<II", mv, 4)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Versión de tabla no soportada: {version}")
+    off = 12
+    meta = json.loads(bytes(mv[off:off + hlen]).decode("utf-8"))
+    off += hlen
+    arrays = []
+    for n in meta["lens"]:
+        view = mv[off:off + 4 * n].cast("i")
+        if meta["byteorder"] != sys.byteorder:
+            view = array("i", view)
+            view.byteswap()
+        arrays.append(view)
+        off += 4 * n
+    fields = dict(zip(ARRAY_FIELDS, arrays))
+    tables = CompiledTables(meta["terms"], meta["nonterms"], fields["prod_lhs"], fields["prod_len"],
+                            fields["base"], fields["table"], fields["check"], fields["defred"],
+                            [int(m, 16) for m in meta["defmask"]],
+                            fields["gbase"], fields["gtable"], fields["gcheck"],
+                            {(s, t): tuple(codes) for s, t, codes in meta["multi"]},
+                            {(s, A): tuple((tuple(chain), int(mask, 16)) for chain, mask in alts)
+                             for s, A, alts in meta["unit_chains"]},
+                            meta["virtual"])
+    return tables, meta["extra"]
@@ -0,0 +1,218 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+from grammar import END
+from compiled_tables import CompiledTables
+
+REPAIR_COSTS = {"insert": 1, "delete": 1, "replace": 1}
+
+@dataclass
+class SyntaxErrorInfo:
+    pos: int
+    token: str
+    state: int
+    expected: Tuple[str, ...]
+    recovery: str = ""
+
+    def message(self, limit: int = 8) -> str:
+        exp = ", ".join(self.expected[:limit]) + (", …" if len(self.expected) > limit else "")
+        return f"posición {self.pos}: token inesperado '{self.token}', se esperaba: {exp or '(nada)'}; {self.recovery}"
+
+@dataclass
+class RecoveryResult:
+    accepted: bool
+    completed: bool
+    steps: int
+    errors: List[SyntaxErrorInfo] = field(default_factory=list)
+
+def _reduce_width(T: CompiledTables) -> int:
+    return max(T.prod_len, default=0) + len(T.nonterms)
+
+class _Sim:
+    __slots__ = ("T", "stack", "cut", "over", "accepted", "width")
+
+    def __init__(self, T: CompiledTables, stack: List[int], cut: Optional[int] = None, over: Optional[List[int]] = None,
+                 width: Optional[int] = None):
+        self.T = T
+        self.stack = stack
+        self.cut = len(stack) if cut is None else cut
+        self.over = over or []
+        self.accepted = False
+        self.width = _reduce_width(T) if width is None else width
+
+    def copy(self) -> "_Sim":
+        return _Sim(self.T, self.stack, self.cut, list(self.over), self.width)
+
+    def top(self) -> int:
+        return self.over[-1] if self.over else self.stack[self.cut - 1]
+
+    def feed(self, t: int) -> bool:
+        T = self.T
+        if t < 0:
+            return False
+        cap = (self.cut + len(self.over) + T.nstates) * self.width
+        while True:
+            act = T.action_code(self.top(), t)
+            if act > 0:
+                self.over.append(act - 1)
+                return True
+            if act == 0:
+                return False
+            if act == T.accept:
+                self.accepted = True
+                return True
+            cap -= 1
+            if cap < 0:
+                return False
+            p = -act - 1
+            k = T.prod_len[p]
+            drop = min(k, len(self.over))
+            if drop:
+                del self.over[-drop:]
+            self.cut -= k - drop
+            g = T.goto_state(self.top(), T.prod_lhs[p])
+            if g < 0:
+                return False
+            self.over.append(g)
+
+    def run(self, ids: List[int], i: int, n: int) -> int:
+        done = 0
+        while done < n and i + done < len(ids):
+            if not self.feed(ids[i + done]):
+                break
+            done += 1
+            if self.accepted:
+                return n
+        return done
+
+def _candidates(sim: _Sim, ids: List[int], i: int, end_id: int, budget: int, costs: Dict[str, int], path: tuple):
+    if path:
+        yield path, sim, i
+    if budget <= 0:
+        return
+    T = sim.T
+    for t in T.expected_ids(sim.top()):
+        if t == end_id:
+            continue
+        if costs["insert"] <= budget:
+            nxt = sim.copy()
+            if nxt.feed(t) and not nxt.accepted:
+                yield from _candidates(nxt, ids, i, end_id, budget - costs["insert"], costs, path + (("insert", t),))
+        if costs["replace"] <= budget and ids[i] != end_id and t != ids[i]:
+            nxt = sim.copy()
+            if nxt.feed(t) and not nxt.accepted:
+                yield from _candidates(nxt, ids, i + 1, end_id, budget - costs["replace"], costs, path + (("replace", t),))
+    if costs["delete"] <= budget and ids[i] != end_id:
+        yield from _candidates(sim, ids, i + 1, end_id, budget - costs["delete"], costs, path + (("delete", None),))
+
+def find_repair(T: CompiledTables, stack: List[int], ids: List[int], i: int, max_cost: int = 1,
+                costs: Optional[Dict[str, int]] = None, check: int = 3):
+    costs = costs or REPAIR_COSTS
+    end_id = T.term_id[END]
+    best = None
+    for path, sim, j in _candidates(_Sim(T, stack), ids, i, end_id, max_cost, costs, ()):
+        need = min(check, len(ids) - j)
+        ok = sim.copy().run(ids, j, 4 * check)
+        if ok < need:
+            continue
+        score = (sum(costs[op] for op, _ in path), -ok)
+        if best is None or score < best[0]:
+            best = (score, path, j)
+    return best
+
+def _describe(T: CompiledTables, path, toks: List[str], i: int) -> str:
+    out = []
+    for op, t in path:
+        if op == "insert":
+            out.append(f"insertar '{T.terms[t]}'")
+        elif op == "delete":
+            out.append(f"eliminar '{toks[i]}'")
+            i += 1
+        else:
+            out.append(f"reemplazar '{toks[i]}' por '{T.terms[t]}'")
+            i += 1
+    return "reparación: " + ", ".join(out)
+
+def parse_with_recovery(tokens: Iterable[str], tables: CompiledTables, sync: Optional[Iterable[str]] = None,
+                        repair: bool = True, max_cost: int = 1, costs: Optional[Dict[str, int]] = None,
+                        check: int = 3, max_errors: int = 100) -> RecoveryResult:
+    T = tables
+    toks = list(tokens) + [END]
+    ids = [T.term_id.get(tok, -1) for tok in toks]
+    end_id = T.term_id[END]
+    sync_ids = None if sync is None else {T.term_id[x] for x in sync if x in T.term_id} | {end_id}
+    stack = [0]
+    pending: List[int] = []
+    errors: List[SyntaxErrorInfo] = []
+    i = steps = 0
+    last_panic = last_repair = -1
+    width = _reduce_width(T)
+    cap = (1 + T.nstates) * width
+    while True:
+        s = stack[-1]
+        t = pending[-1] if pending else ids[i]
+        steps += 1
+        act = T.action_code(s, t) if t >= 0 else 0
+        if act > 0:
+            stack.append(act - 1)
+            if pending:
+                pending.pop()
+            else:
+                i += 1
+            cap = (len(stack) + T.nstates) * width
+            continue
+        if act == T.accept:
+            return RecoveryResult(not errors, True, steps, errors)
+        if act < 0:
+            cap -= 1
+            if cap < 0:
+                errors.append(SyntaxErrorInfo(i, toks[i], s, T.expected(s),
+                                              "ciclo de reducciones sin desplazamiento; análisis detenido"))
+                return RecoveryResult(False, False, steps, errors)
+            p = -act - 1
+            k = T.prod_len[p]
+            if k:
+                del stack[-k:]
+            g = T.goto_state(stack[-1], T.prod_lhs[p])
+            if g >= 0:
+                stack.append(g)
+                continue
+            s = stack[-1]
+        pending.clear()
+        err = SyntaxErrorInfo(i, toks[i], s, T.expected(s))
+        errors.append(err)
+        if len(errors) >= max_errors:
+            err.recovery = "demasiados errores; análisis detenido"
+            return RecoveryResult(False, False, steps, errors)
+        if repair and i > last_repair:
+            fix = find_repair(T, stack, ids, i, max_cost, costs, check)
+            if fix is not None:
+                _, path, j = fix
+                err.recovery = _describe(T, path, toks, i)
+                pending = [t for op, t in reversed(path) if op != "delete"]
+                last_repair = i
+                i = j
+                cap = (len(stack) + T.nstates) * width
+                continue
+        skipped = 0
+        if i == last_panic:
+            if ids[i] == end_id:
+                err.recovery = "modo pánico: no se pudo sincronizar antes del fin"
+                return RecoveryResult(False, False, steps, errors)
+            i += 1
+            skipped += 1
+        while True:
+            t = ids[i]
+            if t >= 0 and (sync_ids is None or t in sync_ids):
+                d = next((d for d in range(len(stack) - 1, -1, -1) if T.action_code(stack[d], t)), -1)
+                if d >= 0:
+                    popped = len(stack) - 1 - d
+                    del stack[d + 1:]
+                    break
+            if t == end_id:
+                err.recovery = f"modo pánico: se descartaron {skipped} tokens; no se pudo sincronizar antes del fin"
+                return RecoveryResult(False, False, steps, errors)
+            i += 1
+            skipped += 1
+        last_panic = i
+        cap = (len(stack) + T.nstates) * width
+        err.recovery = f"modo pánico: se descartaron {skipped} tokens y {popped} estados; se reanuda en '{toks[i]}'"
@@ -0,0 +1,15 @@
+EXAMPLES = {
+    "Gramática simple (S → CC)": """S -> C C
+C -> c C | d""",
+    "Expresiones aritméticas": """E -> E + T | T
+T -> T * F | F
+F -> ( E ) | id""",
+    "Paréntesis balanceados": """S -> ( S ) | ε""",
+    "if-then-else": """S -> i E t S | i E t S e S | a
+E -> b""",
+    "Expresiones con precedencia": """%left + -
+%left * /
+%right UMINUS
+%right ^
+E -> E + E | E - E | E * E | E / E | E ^ E | - E %prec UMINUS | ( E ) | id"""
+}
@@ -0,0 +1,275 @@
+from dataclasses import dataclass
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from grammar import END
+from compiled_tables import CompiledTables
+from parse_tree import ParseTreeArena, TreeNode, _dot_label
+
+class SPPFNode:
+    __slots__ = ("symbol", "start", "end", "families", "leaf", "item")
+
+    def __init__(self, symbol: str, start: int, end: int, leaf: bool = False, item: Optional[Tuple[int, int]] = None):
+        self.symbol = symbol
+        self.start = start
+        self.end = end
+        self.families: Dict[Tuple[int, tuple], None] = {}
+        self.leaf = leaf
+        self.item = item
+
+    @property
+    def ambiguous(self) -> bool:
+        return len(self.families) > 1
+
+    def title(self, aug=None) -> str:
+        if self.item is None:
+            return self.symbol
+        p, d = self.item
+        if aug is None:
+            return f"r{p}·{d}"
+        return f"{aug[p][0]} → {' '.join(aug[p][1][:d])} • {' '.join(aug[p][1][d:])}"
+
+    def __repr__(self):
+        name = repr(self.symbol) if self.item is None else self.title()
+        return f"SPPFNode({name}, {self.start}, {self.end}, {len(self.families)} alternativas)"
+
+class GSSNode:
+    __slots__ = ("state", "level", "edges")
+
+    def __init__(self, state: int, level: int):
+        self.state = state
+        self.level = level
+        self.edges: Dict["GSSNode", SPPFNode] = {}
+
+@dataclass
+class GLRResult:
+    accepted: bool
+    pos: int
+    token: Optional[str]
+    forest: Optional[SPPFNode]
+    gss_nodes: int
+    sppf_nodes: int
+    truncated: bool = False
+
+    def trees(self) -> float:
+        return count_trees(self.forest) if self.forest is not None else 0
+
+def _paths(v: GSSNode, p: int, k: int, A: str, via: Optional[Tuple[GSSNode, GSSNode]], level: Dict[tuple, SPPFNode], j: int):
+    if k > 1:
+        return _long_paths(v, p, k, A, via, level, j)
+    if not k:
+        return [(v, ())] if via is None else []
+    return [(u, (label,)) for u, label in v.edges.items() if via is None or (v, u) == via]
+
+def _long_paths(v: GSSNode, p: int, k: int, A: str, via: Optional[Tuple[GSSNode, GSSNode]], level: Dict[tuple, SPPFNode],
+                j: int) -> Iterator[Tuple[GSSNode, tuple]]:
+    seen = set()
+    low = via[0].level if via is not None else -1
+    work = [(v, k, None, via is None)]
+    while work:
+        node, left, rest, hit = work.pop()
+        left -= 1
+        edges = node.edges.items()
+        for u, label in (list(edges) if node.level == j else edges):
+            ok = hit or (node, u) == via
+            if not ok and u.level < low:
+                continue
+            if not left:
+                if ok:
+                    yield u, (label, rest)
+                continue
+            if rest is None:
+                nxt = label
+            else:
+                key = (p, left, u.level)
+                nxt = level.get(key)
+                if nxt is None:
+                    nxt = level[key] = SPPFNode(A, u.level, j, item=(p, left))
+                nxt.families[(p, (label, rest))] = None
+            if (u, left, ok) not in seen:
+                seen.add((u, left, ok))
+                work.append((u, left, nxt, ok))
+
+def parse_glr(tokens: Iterable[str], tables: CompiledTables, max_nodes: Optional[int] = None) -> GLRResult:
+    T = tables
+    prod_lhs, prod_len, accept = T.prod_lhs, T.prod_len, T.accept
+    nonterms, actions, goto_state, term_id = T.nonterms, T.actions, T.goto_state, T.term_id
+    bottom = GSSNode(0, 0)
+    frontier: Dict[int, GSSNode] = {0: bottom}
+    gss = 1
+    sppf = 0
+    reductions: List[Tuple[GSSNode, int, Optional[Tuple[GSSNode, GSSNode]]]] = []
+    shifts: List[Tuple[GSSNode, int]] = []
+    accepted: List[GSSNode] = []
+    def actor(node: GSSNode):
+        for code in actions(node.state, t):
+            if code > 0:
+                shifts.append((node, code - 1))
+            elif code == accept:
+                accepted.append(node)
+            else:
+                reductions.append((node, -code - 1, None))
+    j = 0
+    for tok in chain(tokens, (END,)):
+        t = term_id.get(tok, -1)
+        level: Dict[tuple, SPPFNode] = {}
+        shifts.clear()
+        if t >= 0:
+            for node in frontier.values():
+                actor(node)
+        while reductions:
+            v, p, via = reductions.pop()
+            A = prod_lhs[p]
+            name = nonterms[A]
+            for u, kids in _paths(v, p, prod_len[p], name, via, level, j):
+                g = goto_state(u.state, A)
+                if g < 0:
+                    continue
+                key = (name, u.level)
+                label = level.get(key)
+                if label is None:
+                    label = level[key] = SPPFNode(name, u.level, j)
+                label.families[(p, kids)] = None
+                w = frontier.get(g)
+                if w is None:
+                    w = frontier[g] = GSSNode(g, j)
+                    gss += 1
+                    w.edges[u] = label
+                    actor(w)
+                elif u not in w.edges:
+                    w.edges[u] = label
+                    for x in frontier.values():
+                        for code in actions(x.state, t):
+                            if code < 0 and code != accept and prod_len[-code - 1]:
+                                reductions.append((x, -code - 1, (w, u)))
+        sppf += len(level)
+        for f in level.values():
+            sppf += len(f.families)
+        if max_nodes is not None and sppf > max_nodes:
+            return GLRResult(False, j, tok, None, gss, sppf, truncated=True)
+        if accepted:
+            root = next((n.edges[bottom] for n in accepted if bottom in n.edges), None)
+            return GLRResult(root is not None, j, None, root, gss, sppf)
+        if not shifts:
+            return GLRResult(False, j, tok, None, gss, sppf)
+        leaf = SPPFNode(tok, j, j + 1, leaf=True)
+        sppf += 1
+        nxt: Dict[int, GSSNode] = {}
+        for node, s2 in shifts:
+            w = nxt.get(s2)
+            if w is None:
+                w = nxt[s2] = GSSNode(s2, j + 1)
+                gss += 1
+            w.edges[node] = leaf
+        frontier = nxt
+        j += 1
+    return GLRResult(False, j, END, None, gss, sppf)
+
+def _walk(root: SPPFNode) -> Iterator[SPPFNode]:
+    seen = {id(root)}
+    work = [root]
+    while work:
+        f = work.pop()
+        yield f
+        for _, kids in f.families:
+            for c in kids:
+                if id(c) not in seen:
+                    seen.add(id(c))
+                    work.append(c)
+
+def ambiguous_nodes(root: SPPFNode) -> List[SPPFNode]:
+    return [f for f in _walk(root) if f.ambiguous]
+
+def count_trees(root: SPPFNode) -> float:
+    memo: Dict[int, float] = {}
+    onpath = set()
+    work = [(root, False)]
+    while work:
+        f, done = work.pop()
+        if id(f) in memo:
+            continue
+        if f.leaf:
+            memo[id(f)] = 1
+            continue
+        if done:
+            onpath.discard(id(f))
+            total = 0
+            for _, kids in f.families:
+                n = 1
+                for c in kids:
+                    n *= memo.get(id(c), float("inf"))
+                total += n
+            memo[id(f)] = total
+            continue
+        if id(f) in onpath:
+            continue
+        onpath.add(id(f))
+        work.append((f, True))
+        for _, kids in f.families:
+            for c in kids:
+                if id(c) not in memo:
+                    work.append((c, False))
+    return memo[id(root)]
+
+def _heights(root: SPPFNode) -> Dict[int, float]:
+    nodes = list(_walk(root))
+    h = {id(f): (0 if f.leaf else float("inf")) for f in nodes}
+    changed = True
+    while changed:
+        changed = False
+        for f in nodes:
+            for _, kids in f.families:
+                v = (f.item is None) + max((h[id(c)] for c in kids), default=0)
+                if v < h[id(f)]:
+                    h[id(f)] = v
+                    changed = True
+    return h
+
+def forest_to_tree(root: SPPFNode) -> TreeNode:
+    h = _heights(root)
+    pick = lambda f: min(f.families, key=lambda fam: max((h[id(c)] for c in fam[1]), default=0))[1]
+    arena = ParseTreeArena()
+    nodes: List[int] = []
+    work: List[Tuple[SPPFNode, int]] = [(root, -1)]
+    while work:
+        f, k = work.pop()
+        if f.leaf:
+            nodes.append(arena.add_leaf(f.symbol, f.start))
+        elif k >= 0:
+            arena.reduce(f.symbol, nodes, k, f.end)
+        else:
+            kids = pick(f)
+            while kids and kids[-1].item is not None:
+                kids = kids[:-1] + pick(kids[-1])
+            work.append((f, len(kids)))
+            work.extend((c, -1) for c in reversed(kids))
+    return arena.node(nodes[-1])
+
+def forest_to_dot(root: SPPFNode, aug=None, max_nodes: int = 500) -> str:
+    ids: Dict[int, int] = {}
+    lines = ["digraph SPPF {", '  node [shape=box, fontname="Helvetica"];']
+    for f in _walk(root):
+        if len(ids) >= max_nodes:
+            lines.append(f'  trunc [label="… (más de {max_nodes} nodos)", shape=plaintext];')
+            break
+        ids[id(f)] = n = len(ids)
+        shape = ", shape=ellipse" if f.leaf else (", color=red" if f.ambiguous else "")
+        if f.item is not None:
+            shape += ", style=dashed"
+        lines.append(f'  n{n} [label="{_dot_label(f.title(aug))} [{f.start},{f.end}]"{shape}];')
+    for f in _walk(root):
+        if id(f) not in ids:
+            continue
+        n = ids[id(f)]
+        packed = len(f.families) > 1
+        for a, (p, kids) in enumerate(f.families):
+            src = f"n{n}"
+            if packed:
+                src = f"p{n}_{a}"
+                title = f"{aug[p][0]} → {' '.join(aug[p][1]) or 'ε'}" if aug else f"r{p}"
+                lines.append(f'  {src} [label="{_dot_label(title)}", shape=point, xlabel="{_dot_label(title)}"];')
+                lines.append(f"  n{n} -> {src};")
+            for c in kids:
+                if id(c) in ids:
+                    lines.append(f"  {src} -> n{ids[id(c)]};")
+    lines.append("}")
+    return "\n".join(lines)
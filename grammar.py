@@ -1,53 +1,183 @@
 from collections import defaultdict
-from typing import List, Tuple, Set, Dict, Iterable
+from dataclasses import dataclass, field
+from typing import List, Tuple, Set, Dict, Iterable, Optional
 
 EPS = "ε"
 END = "$"
 
-def parse_grammar_text(gram_text: str):
+ASSOC = ("left", "right", "nonassoc")
+
+@dataclass
+class Precedence:
+    levels: Dict[str, Tuple[int, str]] = field(default_factory=dict)
+    rules: Dict[int, str] = field(default_factory=dict)
+
+    def __bool__(self):
+        return bool(self.levels)
+
+    def of_rule(self, pidx: int, body: List[str], terminals: Set[str]) -> Optional[Tuple[int, str]]:
+        tok = self.rules.get(pidx)
+        if tok is not None:
+            return self.levels.get(tok)
+        for X in reversed(body):
+            if X in terminals:
+                return self.levels.get(X)
+        return None
+
+    def key(self):
+        return [sorted([t, lvl, a] for t, (lvl, a) in self.levels.items()), sorted([p, t] for p, t in self.rules.items())]
+
+def _parse_lines(gram_text: str):
     lines = [ln.strip() for ln in gram_text.strip().splitlines() if ln.strip()]
     prods: List[Tuple[str, List[str]]] = []
     heads = []
+    prec = Precedence()
     for line in lines:
+        if line.startswith("%"):
+            directive, *toks = line.split()
+            assoc = directive[1:]
+            if assoc not in ASSOC:
+                raise ValueError(f"Directiva desconocida: {directive} (usa %left, %right o %nonassoc)")
+            if not toks:
+                raise ValueError(f"La directiva {directive} necesita al menos un token")
+            level = len({lvl for lvl, _ in prec.levels.values()}) + 1
+            for t in toks:
+                prec.levels[t] = (level, assoc)
+            continue
+        if "->" not in line:
+            raise ValueError(f"Línea sin '->': {line}")
         left, right = line.split("->")
         left = left.strip()
         heads.append(left)
         for alt in right.split("|"):
             body = alt.strip().split()
+            if "%prec" in body:
+                i = body.index("%prec")
+                if i != len(body) - 2:
+                    raise ValueError(f"%prec debe ir al final de la alternativa seguido de un token: {left} -> {alt.strip()}")
+                prec.rules[len(prods)] = body[-1]
+                body = body[:i]
             if body == [EPS]:
                 body = []
             prods.append((left, body))
-    start = heads[0]
+    if not heads:
+        raise ValueError("La gramática no tiene producciones")
+    nonterminals = set(heads)
+    terminals = {X for _, B in prods for X in B} - nonterminals
+    for t in prec.levels:
+        if t in nonterminals:
+            raise ValueError(f"{t} es un no terminal; solo los tokens pueden tener precedencia")
+        if t not in terminals and t not in prec.rules.values():
+            raise ValueError(f"{t}: el token de la directiva no aparece en la gramática ni en ningún %prec")
+    for t in prec.rules.values():
+        if t in nonterminals:
+            raise ValueError(f"%prec {t}: es un no terminal, debe ser un token")
+        if t not in prec.levels:
+            raise ValueError(f"%prec {t}: el token no tiene precedencia declarada")
+    return prods, heads[0], prec
+
+def parse_grammar_text(gram_text: str):
+    prods, start, _ = _parse_lines(gram_text)
     nonterminals = {h for h, _ in prods}
     symbols_in_bodies = {s for _, b in prods for s in b}
     terminals = {s for s in symbols_in_bodies if s not in nonterminals}
     return prods, start, nonterminals, terminals
 
-def first_sets(nonterminals: Set[str], terminals: Set[str], prods: List[Tuple[str, List[str]]]):
-    symbols = set(nonterminals) | set(terminals) | {END}
-    FIRST: Dict[str, Set[str]] = {X: set() for X in symbols}
-    for t in set(terminals) | {END}:
-        FIRST[t].add(t)
-    changed = True
-    while changed:
-        changed = False
-        for A, alpha in prods:
-            if not alpha:
-                if EPS not in FIRST[A]:
-                    FIRST[A].add(EPS)
-                    changed = True
+def parse_precedence(gram_text: str) -> Precedence:
+    _, _, prec = _parse_lines(gram_text)
+    return prec
+
+def digraph(nodes: Iterable[str], edges: Dict[str, Iterable[str]], init: Dict[str, int]) -> Dict[str, int]:
+    F = {x: init.get(x, 0) for x in nodes}
+    N = {x: 0 for x in F}
+    done = len(F) + 1
+    stack: List[str] = []
+    for root in F:
+        if N[root]:
+            continue
+        stack.append(root)
+        N[root] = len(stack)
+        work = [(root, iter(edges.get(root, ())), len(stack))]
+        while work:
+            x, it, d = work[-1]
+            y = next(it, None)
+            if y is not None:
+                if N[y] == 0:
+                    stack.append(y)
+                    N[y] = len(stack)
+                    work.append((y, iter(edges.get(y, ())), len(stack)))
+                else:
+                    N[x] = min(N[x], N[y])
+                    F[x] |= F[y]
                 continue
-            acc = set()
-            for s in alpha:
-                acc |= (FIRST[s] - {EPS})
-                if EPS not in FIRST[s]:
-                    break
+            work.pop()
+            if N[x] == d:
+                while True:
+                    top = stack.pop()
+                    N[top] = done
+                    F[top] = F[x]
+                    if top == x:
+                        break
+            if work:
+                parent = work[-1][0]
+                N[parent] = min(N[parent], N[x])
+                F[parent] |= F[x]
+    return F
+
+def nullable_set(nonterminals: Set[str], prods: List[Tuple[str, List[str]]]) -> Set[str]:
+    pending = []
+    uses = defaultdict(list)
+    nullable = set()
+    for i, (A, alpha) in enumerate(prods):
+        if any(s not in nonterminals for s in alpha):
+            pending.append(-1)
+            continue
+        pending.append(len(alpha))
+        for s in alpha:
+            uses[s].append(i)
+        if not alpha and A not in nullable:
+            nullable.add(A)
+    work = list(nullable)
+    while work:
+        X = work.pop()
+        for i in uses[X]:
+            pending[i] -= 1
+            A = prods[i][0]
+            if pending[i] == 0 and A not in nullable:
+                nullable.add(A)
+                work.append(A)
+    return nullable
+
+def first_graph(nonterminals: Set[str], term_bit: Dict[str, int], prods: List[Tuple[str, List[str]]], nullable: Set[str]):
+    init: Dict[str, int] = {}
+    edges: Dict[str, Set[str]] = defaultdict(set)
+    for A, alpha in prods:
+        for s in alpha:
+            if s in nonterminals:
+                edges[A].add(s)
+                if s in nullable:
+                    continue
             else:
-                acc.add(EPS)
-            old = len(FIRST[A])
-            FIRST[A] |= acc
-            if len(FIRST[A]) != old:
-                changed = True
+                init[A] = init.get(A, 0) | term_bit[s]
+            break
+    return init, edges
+
+def first_sets_bits(nonterminals: Set[str], terminals: Set[str], prods: List[Tuple[str, List[str]]]):
+    terms, term_bit = terminal_index(terminals)
+    nullable = nullable_set(nonterminals, prods)
+    init, edges = first_graph(nonterminals, term_bit, prods, nullable)
+    return terms, digraph(sorted(nonterminals), edges, init), nullable
+
+def bits_to_set(mask: int, terms: List[str]) -> Set[str]:
+    return {terms[b] for b in iter_bits(mask)}
+
+def first_sets(nonterminals: Set[str], terminals: Set[str], prods: List[Tuple[str, List[str]]]):
+    terms, bits, nullable = first_sets_bits(nonterminals, terminals, prods)
+    FIRST: Dict[str, Set[str]] = {t: {t} for t in set(terminals) | {END}}
+    for A in nonterminals:
+        FIRST[A] = bits_to_set(bits[A], terms)
+        if A in nullable:
+            FIRST[A].add(EPS)
     return FIRST
 
 def first_of_seq(seq: Iterable[str], FIRST: Dict[str, Set[str]]):
@@ -64,34 +194,38 @@ def first_of_seq(seq: Iterable[str], FIRST: Dict[str, Set[str]]):
         out.add(EPS)
     return out
 
+def first_masks(FIRST: Dict[str, Set[str]], term_bit: Dict[str, int]) -> Dict[str, Tuple[int, bool]]:
+    sym_first = {}
+    for X, fs in FIRST.items():
+        m = 0
+        for a in fs:
+            if a != EPS:
+                m |= term_bit[a]
+        sym_first[X] = (m, EPS in fs)
+    return sym_first
+
+def follow_graph(nonterminals: Set[str], term_bit: Dict[str, int], prods: List[Tuple[str, List[str]]], start: str, sym_first: Dict[str, Tuple[int, bool]]):
+    init: Dict[str, int] = {start: term_bit[END]}
+    edges: Dict[str, Set[str]] = defaultdict(set)
+    for A, alpha in prods:
+        first, nullable = 0, True
+        for X in reversed(alpha):
+            if X in nonterminals:
+                init[X] = init.get(X, 0) | first
+                if nullable:
+                    edges[X].add(A)
+            m, eps = sym_first[X]
+            first, nullable = (m | first, nullable) if eps else (m, False)
+    return init, edges
+
+def follow_sets_bits(nonterminals: Set[str], terminals: Set[str], prods: List[Tuple[str, List[str]]], start: str, FIRST: Dict[str, Set[str]]):
+    terms, term_bit = terminal_index(terminals)
+    init, edges = follow_graph(nonterminals, term_bit, prods, start, first_masks(FIRST, term_bit))
+    return terms, digraph(sorted(nonterminals), edges, init)
+
 def follow_sets(nonterminals: Set[str], terminals: Set[str], prods: List[Tuple[str, List[str]]], start: str, FIRST: Dict[str, Set[str]]):
-    FOLLOW: Dict[str, Set[str]] = {A: set() for A in nonterminals}
-    FOLLOW[start].add(END)
-    changed = True
-    while changed:
-        changed = False
-        for A, alpha in prods:
-            n = len(alpha)
-            for i, B in enumerate(alpha):
-                if B in nonterminals:
-                    beta = alpha[i+1:]
-                    if beta:
-                        first_beta = first_of_seq(beta, FIRST) - {EPS}
-                        before = len(FOLLOW[B])
-                        FOLLOW[B] |= first_beta
-                        if len(FOLLOW[B]) != before:
-                            changed = True
-                        if EPS in first_of_seq(beta, FIRST):
-                            before = len(FOLLOW[B])
-                            FOLLOW[B] |= FOLLOW[A]
-                            if len(FOLLOW[B]) != before:
-                                changed = True
-                    else:
-                        before = len(FOLLOW[B])
-                        FOLLOW[B] |= FOLLOW[A]
-                        if len(FOLLOW[B]) != before:
-                            changed = True
-    return FOLLOW
+    terms, bits = follow_sets_bits(nonterminals, terminals, prods, start, FIRST)
+    return {A: bits_to_set(bits[A], terms) for A in nonterminals}
 
 def augment(prods: List[Tuple[str, List[str]]], start: str):
     if prods and len(prods[0][1]) == 1 and prods[0][0].endswith("'") and prods[0][1][0] == start:
@@ -99,6 +233,16 @@ def augment(prods: List[Tuple[str, List[str]]], start: str):
     S_ = f"{start}'"
     return prods + [(S_, [start])], S_
 
+def terminal_index(terminals: Set[str]):
+    terms = sorted(terminals) + [END]
+    return terms, {t: 1 << i for i, t in enumerate(terms)}
+
+def iter_bits(mask: int):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
 def prods_by_head(prods):
     mp = defaultdict(list)
     for i, (H, B) in enumerate(prods):
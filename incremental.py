@@ -0,0 +1,552 @@
+from collections import defaultdict
+from collections.abc import Mapping
+from typing import Dict, List, Optional, Set, Tuple
+from grammar import (
+    parse_grammar_text,
+    parse_precedence,
+    augment,
+    terminal_index,
+    nullable_set,
+    first_graph,
+    follow_graph,
+    digraph,
+    bits_to_set,
+    iter_bits,
+    EPS,
+    END,
+)
+from lr1_items import ItemSet, LR1Context, closure, successors, kernel_key, lalr_collection, minimal_collection
+from parser_tables import build_tables, fill_state, conflict_cells, conflict_messages, COLLECTIONS, MODES
+from compiled_tables import compile_tables, update_tables, table_symbols
+from table_cache import LazyStates, grammar_hash
+from lr_stats import phase
+
+def _reverse_reach(seeds: Set[str], edges: Dict[str, Set[str]]) -> Set[str]:
+    rev: Dict[str, List[str]] = defaultdict(list)
+    for x, ys in edges.items():
+        for y in ys:
+            rev[y].append(x)
+    seen = set(seeds)
+    work = list(seeds)
+    while work:
+        y = work.pop()
+        for x in rev[y]:
+            if x not in seen:
+                seen.add(x)
+                work.append(x)
+    return seen
+
+def _resolve(nodes: Set[str], init: Dict[str, int], edges: Dict[str, Set[str]], old: Dict[str, int], dirty: Set[str]):
+    F = {x: old[x] for x in nodes if x not in dirty}
+    sub_init = {}
+    sub_edges = {}
+    for x in dirty:
+        m = init.get(x, 0)
+        inside = []
+        for y in edges.get(x, ()):
+            if y in dirty:
+                inside.append(y)
+            else:
+                m |= F[y]
+        sub_init[x] = m
+        sub_edges[x] = inside
+    F.update(digraph(sorted(dirty), sub_edges, sub_init))
+    return F
+
+def _graph_changes(nodes: Set[str], init, edges, old_init, old_edges) -> Set[str]:
+    return {x for x in nodes
+            if init.get(x, 0) != old_init.get(x, 0) or set(edges.get(x, ())) != set(old_edges.get(x, ()))}
+
+class ClosureMemo:
+    def __init__(self):
+        self.content_id: Dict[Tuple, int] = {}
+        self.entries: Dict[tuple, Dict[Tuple[int, int], int]] = {}
+        self.by_dep: Dict[str, Set[tuple]] = defaultdict(set)
+        self.idx_to_cid: List[int] = []
+        self.cid_to_idx: Dict[int, int] = {}
+        self.hits = self.misses = 0
+
+    def bind(self, aug):
+        seen: Dict[Tuple, int] = defaultdict(int)
+        self.idx_to_cid = []
+        for H, B in aug:
+            k = (H, tuple(B))
+            content = k + (seen[k],)
+            seen[k] += 1
+            cid = self.content_id.setdefault(content, len(self.content_id))
+            self.idx_to_cid.append(cid)
+        self.cid_to_idx = {c: i for i, c in enumerate(self.idx_to_cid)}
+        self.hits = self.misses = 0
+        self.used: Set[tuple] = set()
+
+    def prune(self):
+        self.entries = {k: v for k, v in self.entries.items() if k in self.used}
+        for X in list(self.by_dep):
+            self.by_dep[X] &= self.used
+            if not self.by_dep[X]:
+                del self.by_dep[X]
+
+    def invalidate(self, dirty: Set[str]):
+        for X in dirty:
+            for key in self.by_dep.pop(X, ()):
+                self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+        self.by_dep.clear()
+
+    def closure(self, kernel, ctx):
+        to_cid = self.idx_to_cid
+        key = tuple(sorted((to_cid[p], d, m) for (p, d), m in kernel.items()))
+        self.used.add(key)
+        hit = self.entries.get(key)
+        if hit is not None:
+            self.hits += 1
+            to_idx = self.cid_to_idx
+            return {(to_idx[c], d): m for (c, d), m in hit.items()}
+        self.misses += 1
+        items = closure(kernel, ctx)
+        self.entries[key] = {(to_cid[p], d): m for (p, d), m in items.items()}
+        deps = set()
+        for (p, d) in items:
+            for X in ctx.aug[p][1][d:]:
+                if X in ctx.nonterminals:
+                    deps.add(X)
+        for X in deps:
+            self.by_dep[X].add(key)
+        return items
+
+def _done(items, lens, to_cid):
+    return tuple(sorted((to_cid[p], m) for (p, d), m in items.items() if d == lens[p]))
+
+def _map_clashes(clashes, to):
+    return [(k, (old[0], to[old[1]]) if old[0] == 'reduce' else old, (new[0], to[new[1]]) if new[0] == 'reduce' else new)
+            for k, old, new in clashes]
+
+def _stable_numbering(keys, index):
+    n = len(keys)
+    pos = [index.get(k, n) for k in keys]
+    taken = [False] * n
+    for s in pos:
+        if s < n:
+            taken[s] = True
+    free = iter([s for s in range(n) if not taken[s]])
+    return [s if s < n else next(free) for s in pos]
+
+class _LazyItemSet(ItemSet):
+    def __init__(self, key, citems, to_idx, terms):
+        self.terms = terms
+        self._src = (key, citems, to_idx)
+
+    def __getattr__(self, name):
+        if name not in ("kernel", "items", "reduce_cells"):
+            raise AttributeError(name)
+        key, citems, to_idx = self._src
+        self.kernel = kernel_key({(to_idx[c], d): m for c, d, m in key})
+        self.items = {(to_idx[c], d): m for (c, d), m in citems.items()}
+        self.reduce_cells = None
+        return getattr(self, name)
+
+class _KernelIndex(Mapping):
+    def __init__(self, states):
+        self._states = states
+        self._index = None
+
+    def _load(self):
+        if self._index is None:
+            self._index = {I.kernel: i for i, I in enumerate(self._states)}
+        return self._index
+
+    def __getitem__(self, kernel):
+        return self._load()[kernel]
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._states)
+
+class _State:
+    __slots__ = ("itemset", "items", "moves", "cids", "done", "core", "clash", "acts")
+
+    def __init__(self, itemset, items, moves, cids, done, core, clash):
+        self.itemset = itemset
+        self.items = items
+        self.moves = moves
+        self.cids = cids
+        self.done = done
+        self.core = core
+        self.clash = clash
+        self.acts = None
+
+class _Rows:
+    __slots__ = ("mode", "precedence", "index", "sigs", "targets", "clashes", "tables", "idx_to_cid")
+
+    def __init__(self, mode, precedence, keys, sigs, targets, clashes, tables, idx_to_cid):
+        self.mode = mode
+        self.precedence = precedence
+        self.index = {k: s for s, k in enumerate(keys)}
+        self.sigs = sigs
+        self.targets = targets
+        self.clashes = clashes
+        self.tables = tables
+        self.idx_to_cid = idx_to_cid
+
+class StateGraph:
+    def __init__(self, memo: ClosureMemo):
+        self.memo = memo
+        self.nodes: Dict[tuple, _State] = {}
+        self.by_dep: Dict[str, Set[tuple]] = defaultdict(set)
+        self.cid_to_idx: Dict[int, int] = {}
+        self.order: List[tuple] = []
+        self.reused = self.built = 0
+
+    def invalidate(self, dirty: Set[str]):
+        for X in dirty:
+            for key in self.by_dep.pop(X, ()):
+                self.nodes.pop(key, None)
+
+    def clear(self):
+        self.nodes.clear()
+        self.by_dep.clear()
+        self.cid_to_idx = {}
+
+    def state_actions(self, terminals):
+        terms = terminal_index(terminals)[0]
+        out = []
+        for key in self.order:
+            node = self.nodes[key]
+            if node.acts is None:
+                cells: Dict[str, set] = {}
+                for c, m in node.done:
+                    for b in iter_bits(m):
+                        cells.setdefault(terms[b], set()).add(c)
+                for X, _ in node.moves:
+                    if X in terminals:
+                        cells.setdefault(X, set()).add(-1)
+                node.acts = cells
+            out.append(node.acts)
+        return out
+
+    def _expand(self, key, ctx, close, succ):
+        to_idx, to_cid = self.memo.cid_to_idx, self.memo.idx_to_cid
+        kernel = {(to_idx[c], d): m for c, d, m in key}
+        items = close(kernel, ctx)
+        moves = tuple((X, tuple(sorted((to_cid[p], d, m) for (p, d), m in kern.items())))
+                      for X, kern in sorted(succ(items, ctx.aug).items()))
+        citems = {(to_cid[p], d): m for (p, d), m in items.items()}
+        deps = set()
+        for (p, d) in items:
+            for X in ctx.aug[p][1][d:]:
+                if X in ctx.nonterminals:
+                    deps.add(X)
+        for X in deps:
+            self.by_dep[X].add(key)
+        done = _done(items, [len(B) for _, B in ctx.aug], to_cid)
+        seen = clash = 0
+        for _, m in done:
+            clash |= seen & m
+            seen |= m
+        for X, _ in moves:
+            bit = ctx.term_bit.get(X, 0)
+            clash |= seen & bit
+        return _State(ItemSet(kernel_key(kernel), items, ctx.terms), citems, moves, frozenset(c for c, _ in citems),
+                      done, tuple((c, d) for c, d, _ in key), clash)
+
+    def collection(self, prods, start, FIRST, terminals, nonterminals, closure_fn=None, stats=None):
+        with phase(stats, "lr1_context"):
+            ctx = LR1Context(prods, start, FIRST, terminals, nonterminals)
+        aug, S_ = ctx.aug, ctx.S_
+        to_idx = self.memo.cid_to_idx
+        moved = {c for c, i in self.cid_to_idx.items() if to_idx.get(c) != i}
+        close, succ = closure, successors
+        if stats is not None:
+            close = stats.timed("closure", closure, ("closure_items", len))
+            succ = stats.timed("goto", successors, ("goto_targets", len))
+        key0 = ((self.memo.idx_to_cid[len(aug) - 1], 0, ctx.term_bit[END]),)
+        order = [key0]
+        num = {key0: 0}
+        nodes: Dict[tuple, _State] = {}
+        C: List[ItemSet] = []
+        trans = {}
+        dup = reused = 0
+        for i, key in enumerate(order):
+            node = self.nodes.get(key)
+            if node is None:
+                node = self._expand(key, ctx, close, succ)
+            else:
+                reused += 1
+                if moved and not node.cids.isdisjoint(moved):
+                    node.itemset = _LazyItemSet(key, node.items, to_idx, ctx.terms)
+            nodes[key] = node
+            C.append(node.itemset)
+            for X, k in node.moves:
+                j = num.get(k)
+                if j is None:
+                    j = num[k] = len(order)
+                    order.append(k)
+                else:
+                    dup += 1
+                trans[(i, X)] = j
+        self.nodes, self.order = nodes, order
+        for X in list(self.by_dep):
+            self.by_dep[X] = {k for k in self.by_dep[X] if k in nodes}
+            if not self.by_dep[X]:
+                del self.by_dep[X]
+        self.cid_to_idx = dict(to_idx)
+        self.reused, self.built = reused, len(C) - reused
+        if stats is not None:
+            stats.add("states", len(C))
+            stats.add("duplicate_states", dup)
+            stats.add("reused_states", reused)
+        return C, _KernelIndex(C), aug, S_, trans
+
+class IncrementalGrammar:
+    def __init__(self, mode: str = "canonical", cache=None):
+        self.mode = mode
+        self.cache = cache
+        self.memo = ClosureMemo()
+        self.graph = StateGraph(self.memo)
+        self.prods: List[Tuple[str, List[str]]] = []
+        self.start: Optional[str] = None
+        self.precedence = None
+        self.unit_elim = False
+        self.nonterminals: Set[str] = set()
+        self.terminals: Set[str] = set()
+        self.nullable: Set[str] = set()
+        self.first_init: Dict[str, int] = {}
+        self.first_edges: Dict[str, Set[str]] = {}
+        self.first_bits: Dict[str, int] = {}
+        self.follow_init: Dict[str, int] = {}
+        self.follow_edges: Dict[str, Set[str]] = {}
+        self.follow_bits: Dict[str, int] = {}
+        self.FIRST: Dict[str, Set[str]] = {}
+        self.FOLLOW: Dict[str, Set[str]] = {}
+        self.result = None
+        self.from_cache = False
+        self.last_changes: Dict[str, Set[str]] = {}
+        self.rows: Optional[_Rows] = None
+        self.order: Optional[List[int]] = None
+        self.repacked = 0
+
+    def update_text(self, gram_text: str, mode: Optional[str] = None, stats=None):
+        prods, start, nonterminals, terminals = parse_grammar_text(gram_text)
+        return self.update(prods, start, nonterminals, terminals, mode, stats, parse_precedence(gram_text))
+
+    def update(self, prods, start, nonterminals, terminals, mode: Optional[str] = None, stats=None, precedence=None,
+               unit_elim: bool = False):
+        mode = mode or self.mode
+        prods = [(H, list(B)) for H, B in prods]
+        precedence = precedence or None
+        if (self.result is not None and prods == self.prods and start == self.start and mode == self.mode
+                and precedence == self.precedence and unit_elim == self.unit_elim):
+            self.last_changes = {"producciones": set(), "FIRST": set(), "FOLLOW": set()}
+            return self.result
+        with phase(stats, "first_follow"):
+            full, changed_heads, first_changed = self._update_sets(prods, start, nonterminals, terminals)
+        if full:
+            self.memo.clear()
+            self.graph.clear()
+            self.rows = None
+        else:
+            self.memo.invalidate(changed_heads | first_changed)
+            self.graph.invalidate(changed_heads | first_changed)
+        self.memo.bind(augment(prods, start)[0])
+        self.graph.reused = self.graph.built = 0
+        self.from_cache = False
+        self.prods, self.start, self.mode = prods, start, mode
+        self.precedence, self.unit_elim = precedence, unit_elim
+        key = None
+        if self.cache:
+            key = grammar_hash(prods, start, mode, precedence, unit_elim)
+            with phase(stats, "cache_lookup"):
+                hit = self.cache.get(key)
+            if hit is not None:
+                if stats is not None:
+                    stats.add("cache_hits")
+                tables, aug, conflicts, order = hit
+                FIRST = self.FIRST
+                def rebuild_states():
+                    return COLLECTIONS[mode](prods, start, FIRST, terminals, nonterminals)[0]
+                self.result = (tables.action, tables.goto,
+                               LazyStates(tables.nstates - tables.virtual, rebuild_states, order), aug, conflicts)
+                self.from_cache = True
+                self.rows, self.repacked = None, 0
+                return self.result
+        if unit_elim:
+            self.result = build_tables(prods, start, terminals, nonterminals, self.FIRST, mode=mode,
+                                       closure_fn=self.memo.closure, stats=stats, precedence=precedence,
+                                       unit_elim=unit_elim, canonical_fn=self.graph.collection)
+            self.rows, self.order, self.repacked = None, None, self.result[0].tables.nstates
+        else:
+            self.result = self._build(prods, start, terminals, nonterminals, mode, stats, precedence)
+        self.memo.prune()
+        if key is not None:
+            with phase(stats, "cache_store"):
+                self.cache.put(key, self.result[0].tables, self.result[3], self.result[4], self.order)
+        if stats is not None:
+            stats.add("closure_memo_hits", self.memo.hits)
+            stats.add("closure_memo_misses", self.memo.misses)
+        return self.result
+
+    def _build(self, prods, start, terminals, nonterminals, mode, stats, precedence):
+        if mode not in COLLECTIONS:
+            raise ValueError(f"Modo de tabla desconocido: {mode} (usa {', '.join(MODES)})")
+        FIRST, memo = self.FIRST, self.memo
+        with phase(stats, "collection"):
+            if mode == "canonical":
+                C, _, aug, S_, trans = self.graph.collection(prods, start, FIRST, terminals, nonterminals, stats=stats)
+            elif mode == "minimal":
+                C, _, aug, S_, trans = minimal_collection(prods, start, FIRST, terminals, nonterminals, memo.closure, stats,
+                                                          self.graph.collection, self.graph.state_actions)
+            else:
+                C, _, aug, S_, trans = lalr_collection(prods, start, FIRST, terminals, nonterminals, memo.closure, stats)
+        to_cid, to_idx = memo.idx_to_cid, memo.cid_to_idx
+        prev = self.rows
+        if prev is not None and (prev.mode != mode or prev.tables.terms != table_symbols(aug)[0]):
+            prev = None
+        n = len(C)
+        with phase(stats, "actions"):
+            keys, sigs = self._state_keys(mode, C, aug)
+            pos = _stable_numbering(keys, prev.index if prev else {})
+            states, skeys, ssigs = [None] * n, [None] * n, [None] * n
+            for i, s in enumerate(pos):
+                states[s], skeys[s], ssigs[s] = C[i], keys[i], sigs[i]
+            out: List[list] = [[] for _ in range(n)]
+            for (i, X), j in trans.items():
+                out[pos[i]].append((X, pos[j]))
+            targets = [tuple(moves) for moves in out]
+            if prev is not None and prev.precedence == precedence:
+                old = len(prev.sigs)
+                dirty = [s for s in range(n)
+                         if s >= old or prev.sigs[s] != ssigs[s] or prev.targets[s] != targets[s]]
+                clashes = prev.clashes[:n] + [None] * (n - old)
+            else:
+                dirty = list(range(n))
+                clashes = [None] * n
+            ACTION: Dict[tuple, tuple] = {}
+            GOTO: Dict[tuple, int] = {}
+            for s in dirty:
+                rr, sr, resolved = fill_state(s, states[s], targets[s], aug, S_, terminals, precedence, ACTION, GOTO)
+                clashes[s] = (_map_clashes(rr, to_cid), _map_clashes(sr, to_cid), resolved)
+        found = _map_clashes([c for rr, _, _ in clashes for c in rr] + [c for _, sr, _ in clashes for c in sr], to_idx)
+        cells = conflict_cells(found)
+        merged = set()
+        if mode == "lalr" and found:
+            with phase(stats, "lalr_conflict_origin"):
+                merged = self._merged_cells(prods, start, terminals, nonterminals, skeys, cells)
+        conflicts = conflict_messages(found, merged)
+        with phase(stats, "compile"):
+            if prev is None:
+                tables = compile_tables(ACTION, GOTO, aug, nstates=n, conflicts=cells)
+            else:
+                remap = {}
+                for p, c in enumerate(prev.idx_to_cid):
+                    q = to_idx.get(c)
+                    if q is not None and q != p:
+                        remap[-p - 1] = -q - 1
+                if prev.tables.accept != -(len(aug) + 1):
+                    remap[prev.tables.accept] = -(len(aug) + 1)
+                tables = update_tables(prev.tables, ACTION, GOTO, aug, n, dirty, cells, remap)
+        self.rows = _Rows(mode, precedence, skeys, ssigs, targets, clashes, tables, to_cid)
+        order = [0] * n
+        for i, s in enumerate(pos):
+            order[s] = i
+        self.order = None if order == list(range(n)) else order
+        self.repacked = len(dirty)
+        if stats is not None:
+            stats.add("repacked_rows", len(dirty))
+            stats.add("conflicts", len(conflicts))
+            resolved = sum(r for _, _, r in clashes)
+            if resolved:
+                stats.add("conflicts_resolved", resolved)
+            stats.add("table_bytes", tables.nbytes())
+        return tables.action, tables.goto, states, aug, conflicts
+
+    def _state_keys(self, mode, C, aug):
+        if mode == "canonical":
+            nodes = self.graph.nodes
+            return self.graph.order, [nodes[k].done for k in self.graph.order]
+        to_cid = self.memo.idx_to_cid
+        lens = [len(B) for _, B in aug]
+        keys, sigs = [], []
+        seen: Dict[tuple, int] = defaultdict(int)
+        for I in C:
+            if mode == "lalr":
+                key = tuple(sorted((to_cid[p], d) for (p, d), _ in I.kernel))
+            else:
+                kern = tuple(sorted((to_cid[p], d, m) for (p, d), m in I.kernel))
+                key = (kern, seen[kern])
+                seen[kern] += 1
+            keys.append(key)
+            sigs.append(_done(I.items, lens, to_cid))
+        return keys, sigs
+
+    def _merged_cells(self, prods, start, terminals, nonterminals, keys, cells):
+        self.graph.collection(prods, start, self.FIRST, terminals, nonterminals)
+        clash: Dict[tuple, int] = defaultdict(int)
+        for node in self.graph.nodes.values():
+            if node.clash:
+                clash[node.core] |= node.clash
+        term_bit = terminal_index(terminals)[1]
+        return {(s, t) for (s, t) in cells if not clash.get(keys[s], 0) & term_bit[t]}
+
+    @property
+    def reused(self) -> int:
+        return self.graph.reused + self.memo.hits
+
+    @property
+    def rebuilt(self) -> int:
+        return self.graph.built + self.memo.misses
+
+    def _update_sets(self, prods, start, nonterminals, terminals):
+        full = start != self.start or terminals != self.terminals
+        old = defaultdict(list)
+        for H, B in self.prods:
+            old[H].append(B)
+        new = defaultdict(list)
+        for H, B in prods:
+            new[H].append(B)
+        changed_heads = {H for H in set(old) | set(new) if old.get(H) != new.get(H)}
+
+        terms, term_bit = terminal_index(terminals)
+        nullable = nullable_set(nonterminals, prods)
+        f_init, f_edges = first_graph(nonterminals, term_bit, prods, nullable)
+        if full:
+            f_dirty = set(nonterminals)
+        else:
+            f_seeds = _graph_changes(nonterminals, f_init, f_edges, self.first_init, self.first_edges)
+            f_seeds |= nonterminals - set(self.first_bits)
+            f_dirty = _reverse_reach(f_seeds | (nullable ^ self.nullable), f_edges) & nonterminals
+        first_bits = _resolve(nonterminals, f_init, f_edges, self.first_bits, f_dirty)
+        first_changed = {A for A in nonterminals
+                         if first_bits[A] != self.first_bits.get(A) or (A in nullable) != (A in self.nullable)}
+
+        FIRST = {X: fs for X, fs in self.FIRST.items() if X not in f_dirty and X in nonterminals} if not full else {}
+        for t in set(terminals) | {END}:
+            FIRST[t] = {t}
+        for A in f_dirty:
+            FIRST[A] = bits_to_set(first_bits[A], terms)
+            if A in nullable:
+                FIRST[A].add(EPS)
+
+        sym_first = {X: (first_bits[X], X in nullable) for X in nonterminals}
+        sym_first.update({t: (term_bit[t], False) for t in terms})
+        w_init, w_edges = follow_graph(nonterminals, term_bit, prods, start, sym_first)
+        if full:
+            w_dirty = set(nonterminals)
+        else:
+            w_seeds = _graph_changes(nonterminals, w_init, w_edges, self.follow_init, self.follow_edges)
+            w_seeds |= nonterminals - set(self.follow_bits)
+            w_dirty = _reverse_reach(w_seeds, w_edges) & nonterminals
+        follow_bits = _resolve(nonterminals, w_init, w_edges, self.follow_bits, w_dirty)
+        FOLLOW = {A: fs for A, fs in self.FOLLOW.items() if A not in w_dirty and A in nonterminals} if not full else {}
+        for A in w_dirty:
+            FOLLOW[A] = bits_to_set(follow_bits[A], terms)
+
+        self.nonterminals, self.terminals, self.nullable = set(nonterminals), set(terminals), nullable
+        self.first_init, self.first_edges, self.first_bits = f_init, f_edges, first_bits
+        self.follow_init, self.follow_edges, self.follow_bits = w_init, w_edges, follow_bits
+        self.FIRST, self.FOLLOW = FIRST, FOLLOW
+        self.last_changes = {"producciones": changed_heads, "FIRST": f_dirty, "FOLLOW": w_dirty}
+        return full, changed_heads, first_changed
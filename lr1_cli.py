@@ -0,0 +1,200 @@
+import argparse
+import csv
+import json
+import sys
+import time
+from compiled_tables import MAGIC, from_buffer, to_bytes
+from grammar import parse_grammar_text, parse_precedence
+from parser_tables import MODES
+from lr_stats import LRStats
+
+def _load_grammar(path: str, mode: str, unit_elim: bool = False, cache: bool = True, stats=None):
+    from parser_lr1 import build_parser
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] == MAGIC:
+        tables, extra = from_buffer(data)
+        return tables, [(H, B) for H, B in extra["aug"]], extra["conflicts"], tables.nstates - tables.virtual
+    text = data.decode("utf-8")
+    prods, start, nts, ts = parse_grammar_text(text)
+    ACTION, _, states, aug, conflicts = build_parser(prods, start, nts, ts, mode=mode, cache=cache, stats=stats,
+                                                     precedence=parse_precedence(text), unit_elim=unit_elim)
+    return ACTION.tables, aug, conflicts, len(states)
+
+def _read_tokens(path: str):
+    from lr_driver import iter_tokens, read_chunks
+    if path == "-":
+        return list(iter_tokens(read_chunks(sys.stdin)))
+    with open(path, encoding="utf-8") as f:
+        return list(iter_tokens(read_chunks(f)))
+
+def cmd_build(args) -> int:
+    stats = LRStats()
+    t0 = time.perf_counter()
+    tables, aug, conflicts, nstates = _load_grammar(args.grammar, args.mode, args.unit_elim, not args.no_cache, stats)
+    ms = (time.perf_counter() - t0) * 1000
+    for c in conflicts:
+        print(f"aviso: {c}", file=sys.stderr)
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(to_bytes(tables, {"aug": [[H, list(B)] for H, B in aug], "conflicts": list(conflicts)}))
+    print(f"{args.grammar}: {nstates} estados, {len(conflicts)} conflictos, {tables.nbytes():,} bytes, {ms:.1f} ms ({MODES[args.mode]})")
+    if args.stats:
+        for name, value in stats.rows():
+            print(f"  {name}: {value}")
+    return 0
+
+def cmd_check(args) -> int:
+    worst = 0
+    for path in args.grammars:
+        modes = list(MODES) if args.all_modes else [args.mode]
+        for mode in modes:
+            _, _, conflicts, nstates = _load_grammar(path, mode, cache=not args.no_cache)
+            status = "ok" if not conflicts else f"{len(conflicts)} conflictos"
+            print(f"{path} [{mode}]: {nstates} estados, {status}")
+            for c in conflicts:
+                print(f"  {c}")
+            worst = max(worst, 1 if conflicts else 0)
+    return worst
+
+def cmd_parse(args) -> int:
+    from lr_driver import parse_tokens
+    from error_recovery import parse_with_recovery
+    from parse_tree import tree_to_json, tree_to_pretty_text
+    tables, aug, conflicts, _ = _load_grammar(args.grammar, args.mode, args.unit_elim, not args.no_cache)
+    for c in conflicts:
+        print(f"aviso: {c}", file=sys.stderr)
+    rejected = 0
+    for path in args.inputs:
+        tokens = _read_tokens(path)
+        t0 = time.perf_counter()
+        if args.recover:
+            r = parse_with_recovery(tokens, tables, sync=args.sync, repair=args.max_cost > 0, max_cost=args.max_cost)
+            ok, tree = r.accepted, None
+            row = {"input": path, "accepted": r.accepted, "completed": r.completed,
+                   "errors": [e.message() for e in r.errors]}
+        else:
+            r = parse_tokens(tokens, tables, tree=args.tree)
+            ok, tree = r.accepted, r.tree
+            row = {"input": path, "accepted": r.accepted, "pos": r.pos, "token": r.token}
+            if not ok:
+                row["expected"] = list(tables.expected(r.state))
+        row["tokens"] = len(tokens)
+        row["seconds"] = time.perf_counter() - t0
+        rejected += not ok
+        if args.json:
+            if tree is not None:
+                row["tree"] = tree_to_json(tree)
+            print(json.dumps(row, ensure_ascii=False))
+            continue
+        if ok:
+            print(f"{path}: válida ({len(tokens)} tokens, {row['seconds'] * 1000:.1f} ms)")
+        elif args.recover:
+            print(f"{path}: {len(r.errors)} errores")
+            for msg in row["errors"]:
+                print(f"  {msg}")
+        else:
+            print(f"{path}: no válida en la posición {r.pos} (token '{r.token}'), se esperaba: {', '.join(row['expected'])}")
+        if tree is not None:
+            sys.stdout.write(tree_to_pretty_text(tree, "  ", max_nodes=args.max_nodes))
+    return 1 if rejected else 0
+
+def cmd_export(args) -> int:
+    tables, aug, conflicts, nstates = _load_grammar(args.grammar, args.mode, args.unit_elim, not args.no_cache)
+    fmt = args.format
+    if fmt == "py":
+        from codegen import generate_module
+        data = generate_module(tables, aug, args.dispatch)
+    elif fmt == "lr1":
+        data = to_bytes(tables, {"aug": [[H, list(B)] for H, B in aug], "conflicts": list(conflicts)})
+    elif fmt == "json":
+        data = json.dumps({
+            "mode": args.mode,
+            "terminals": tables.terms,
+            "nonterminals": tables.nonterms,
+            "productions": [[H, list(B)] for H, B in aug],
+            "conflicts": conflicts,
+            "action": [[s, a, act[0], act[1]] for (s, a), act in tables.action.items()],
+            "goto": [[s, A, j] for (s, A), j in tables.goto.items()],
+        }, ensure_ascii=False, indent=1)
+    else:
+        out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+        w = csv.writer(out)
+        w.writerow(["state"] + tables.terms + tables.nonterms)
+        for s in range(tables.nstates):
+            row = [s]
+            for t in range(len(tables.terms)):
+                v = tables.action_code(s, t)
+                row.append("" if not v else "acc" if v == tables.accept else f"s{v - 1}" if v > 0 else f"r{-v - 1}")
+            row += [("" if g < 0 else g) for g in (tables.goto_state(s, A) for A in range(len(tables.nonterms)))]
+            w.writerow(row)
+        if args.output:
+            out.close()
+        return 0
+    if args.output:
+        with open(args.output, "wb" if fmt == "lr1" else "w", **({} if fmt == "lr1" else {"encoding": "utf-8"})) as f:
+            f.write(data)
+    elif fmt == "lr1":
+        sys.stdout.buffer.write(data)
+    else:
+        sys.stdout.write(data + ("" if data.endswith("\n") else "\n"))
+    return 0
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv[:1] == ["serve"]:
+        from lr1_server import main as serve_main
+        return serve_main(argv[1:])
+    ap = argparse.ArgumentParser(description="Analizador LR sin interfaz: construir tablas, revisar conflictos, analizar archivos, exportar y servir.")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    def grammar_opts(p):
+        p.add_argument("--mode", choices=list(MODES), default="lalr")
+        p.add_argument("--unit-elim", action="store_true", help="elimina las reducciones unitarias de las tablas")
+        p.add_argument("--no-cache", action="store_true", help="no usar la caché de tablas")
+
+    p = sub.add_parser("build", help="construye las tablas e informa estados, conflictos y tamaño")
+    p.add_argument("grammar", help="archivo con la gramática")
+    p.add_argument("-o", "--output", help="guarda las tablas compiladas (.lr1)")
+    p.add_argument("--stats", action="store_true", help="muestra contadores y tiempos por fase")
+    grammar_opts(p)
+    p.set_defaults(fn=cmd_build)
+
+    p = sub.add_parser("check", help="revisa conflictos; termina con código 1 si hay alguno")
+    p.add_argument("grammars", nargs="+")
+    p.add_argument("--mode", choices=list(MODES), default="lalr")
+    p.add_argument("--all-modes", action="store_true", help="revisa los tres modos")
+    p.add_argument("--no-cache", action="store_true")
+    p.set_defaults(fn=cmd_check)
+
+    p = sub.add_parser("parse", help="analiza archivos de tokens separados por espacios (- = entrada estándar)")
+    p.add_argument("grammar", help="archivo con la gramática o tablas .lr1")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("--tree", action="store_true", help="muestra el árbol de derivación")
+    p.add_argument("--max-nodes", type=int, default=None, help="máximo de nodos del árbol en modo texto")
+    p.add_argument("--json", action="store_true", help="una línea JSON por entrada")
+    p.add_argument("--recover", action="store_true", help="recupera errores y los informa todos")
+    p.add_argument("--sync", nargs="*", default=None)
+    p.add_argument("--max-cost", type=int, default=1)
+    grammar_opts(p)
+    p.set_defaults(fn=cmd_parse)
+
+    p = sub.add_parser("export", help="exporta las tablas (json, csv, lr1) o un módulo Python (py)")
+    p.add_argument("grammar")
+    p.add_argument("--format", choices=["json", "csv", "lr1", "py"], default="json")
+    p.add_argument("-o", "--output")
+    p.add_argument("--dispatch", action="store_true", help="con --format py, genera código por estado")
+    grammar_opts(p)
+    p.set_defaults(fn=cmd_export)
+
+    sub.add_parser("serve", help="arranca el servidor de análisis (opciones: lr1_cli.py serve --help)")
+
+    args = ap.parse_args(argv)
+    try:
+        return args.fn(args)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,10 @@
-from dataclasses import dataclass
-from typing import Set
-from grammar import first_of_seq, END
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from grammar import terminal_index, first_masks, iter_bits, END
+from lr_stats import LRStats, phase
+
+Core = Tuple[int, int]
 
 @dataclass(frozen=True)
 class Item:
@@ -8,59 +12,271 @@ class Item:
     dot: int
     look: str
 
-def closure(items: Set[Item], prods, by_head, FIRST, nonterminals: Set[str]):
-    C = set(items)
-    changed = True
-    while changed:
-        changed = False
-        addQ = set()
-        for it in C:
-            pidx, dot, la = it.prod_idx, it.dot, it.look
-            H, B = prods[pidx]
-            if dot < len(B):
-                X = B[dot]
-                if X in nonterminals:
-                    beta_a = B[dot + 1:] + [la]
-                    looks = first_of_seq(beta_a, FIRST)
-                    for (qidx, _, qB) in by_head[X]:
-                        for a in looks:
-                            newi = Item(qidx, 0, a)
-                            if newi not in C:
-                                addQ.add(newi)
-        if addQ:
-            C |= addQ
-            changed = True
-    return C
-
-def goto(I: Set[Item], X: str, prods):
-    J = set()
-    for it in I:
-        pidx, dot, la = it.prod_idx, it.dot, it.look
-        H, B = prods[pidx]
+@dataclass(eq=False)
+class ItemSet:
+    kernel: Tuple[Tuple[Core, int], ...]
+    items: Dict[Core, int]
+    terms: List[str]
+    reduce_cells: Optional[List[Tuple[str, tuple]]] = field(default=None, repr=False)
+
+    def lookaheads(self, mask: int) -> List[str]:
+        return [self.terms[b] for b in iter_bits(mask)]
+
+    def reductions(self, aug, S_) -> List[Tuple[str, tuple]]:
+        if self.reduce_cells is None:
+            cells = []
+            for (pidx, dot), mask in sorted(self.items.items(), reverse=True):
+                H, B = aug[pidx]
+                if dot < len(B):
+                    continue
+                for la in self.lookaheads(mask):
+                    cells.append((la, ('accept', 0) if H == S_ and la == END else ('reduce', pidx)))
+            self.reduce_cells = cells
+        return self.reduce_cells
+
+    def __iter__(self):
+        for (pidx, dot), mask in self.items.items():
+            for a in self.lookaheads(mask):
+                yield Item(pidx, dot, a)
+
+    def __len__(self):
+        return sum(bin(mask).count("1") for mask in self.items.values())
+
+def kernel_key(kernel: Dict[Core, int]):
+    return tuple(sorted(kernel.items()))
+
+class LR1Context:
+    def __init__(self, prods, start, FIRST, terminals, nonterminals):
+        from grammar import augment, prods_by_head
+        self.aug, self.S_ = augment(prods, start)
+        self.by_head = prods_by_head(self.aug)
+        self.nonterminals = nonterminals | {self.S_}
+        self.terms, self.term_bit = terminal_index(terminals)
+        sym_first = first_masks(FIRST, self.term_bit)
+        self.expand: List[List[Optional[Tuple[Tuple[Core, ...], int, bool]]]] = []
+        for H, B in self.aug:
+            first, nullable = 0, True
+            suffix = [(0, True)]
+            for X in reversed(B):
+                m, eps = sym_first[X]
+                first, nullable = (m | first, nullable) if eps else (m, False)
+                suffix.append((first, nullable))
+            suffix.reverse()
+            row = []
+            for dot, X in enumerate(B):
+                if X in self.nonterminals:
+                    targets = tuple((q, 0) for (q, _, _) in self.by_head[X])
+                    row.append((targets,) + suffix[dot + 1])
+                else:
+                    row.append(None)
+            row.append(None)
+            self.expand.append(row)
+
+def closure(kernel: Dict[Core, int], ctx: LR1Context):
+    items = dict(kernel)
+    work = list(items)
+    expand = ctx.expand
+    while work:
+        pidx, dot = core = work.pop()
+        step = expand[pidx][dot]
+        if step is None:
+            continue
+        targets, first, nullable = step
+        looks = first | items[core] if nullable else first
+        for q in targets:
+            old = items.get(q, 0)
+            if looks | old != old:
+                items[q] = looks | old
+                work.append(q)
+    return items
+
+def goto(I: ItemSet, X: str, prods):
+    J = {}
+    for (pidx, dot), mask in I.items.items():
+        B = prods[pidx][1]
         if dot < len(B) and B[dot] == X:
-            J.add(Item(pidx, dot + 1, la))
+            J[(pidx, dot + 1)] = mask
     return J
 
-def canonical_collection(prods, start, FIRST, terminals, nonterminals):
-    from grammar import augment, prods_by_head
-    aug, S_ = augment(prods, start)
-    by_head = prods_by_head(aug)
-    I0 = closure({Item(len(aug) - 1, 0, END)}, aug, by_head, FIRST, nonterminals | {S_})
+def successors(items: Dict[Core, int], prods):
+    moves: Dict[str, Dict[Core, int]] = {}
+    for (pidx, dot), mask in items.items():
+        B = prods[pidx][1]
+        if dot < len(B):
+            moves.setdefault(B[dot], {})[(pidx, dot + 1)] = mask
+    return moves
+
+def _instrument(stats: LRStats, closure_fn, key_fn):
+    return (stats.timed("closure", closure_fn, ("closure_items", len)),
+            stats.timed("goto", successors, ("goto_targets", len)),
+            stats.timed("state_hashing", key_fn))
+
+def canonical_collection(prods, start, FIRST, terminals, nonterminals, closure_fn=closure, stats: Optional[LRStats] = None):
+    with phase(stats, "lr1_context"):
+        ctx = LR1Context(prods, start, FIRST, terminals, nonterminals)
+    aug, S_, terms = ctx.aug, ctx.S_, ctx.terms
+    succ, key_of = successors, kernel_key
+    if stats is not None:
+        closure_fn, succ, key_of = _instrument(stats, closure_fn, kernel_key)
+    k0 = {(len(aug) - 1, 0): ctx.term_bit[END]}
+    I0 = ItemSet(kernel_key(k0), closure_fn(k0, ctx), terms)
     C = [I0]
-    index = {frozenset(I0): 0}
-    symbols = sorted(terminals | nonterminals)
-    changed = True
-    while changed:
-        changed = False
-        for I in list(C):
-            for X in symbols:
-                base = goto(I, X, aug)
-                if not base:
-                    continue
-                J = closure(base, aug, by_head, FIRST, nonterminals | {S_})
-                fJ = frozenset(J)
-                if fJ not in index:
-                    index[fJ] = len(C)
-                    C.append(J)
-                    changed = True
-    return C, index, aug, S_
\ No newline at end of file
+    index = {I0.kernel: 0}
+    trans = {}
+    queue = deque([0])
+    dup = 0
+    while queue:
+        i = queue.popleft()
+        moves = succ(C[i].items, aug)
+        for X in sorted(moves):
+            key = key_of(moves[X])
+            j = index.get(key)
+            if j is None:
+                j = index[key] = len(C)
+                C.append(ItemSet(key, closure_fn(moves[X], ctx), terms))
+                queue.append(j)
+            else:
+                dup += 1
+            trans[(i, X)] = j
+    if stats is not None:
+        stats.add("states", len(C))
+        stats.add("duplicate_states", dup)
+    return C, index, aug, S_, trans
+
+def core_key(kernel):
+    return tuple(sorted(core for core in kernel))
+
+def _absorb(kernel: Dict[Core, int], incoming: Dict[Core, int]):
+    grown = False
+    for core, mask in incoming.items():
+        old = kernel[core]
+        if mask | old != old:
+            kernel[core] = mask | old
+            grown = True
+    return grown
+
+def lalr_collection(prods, start, FIRST, terminals, nonterminals, closure_fn=closure, stats: Optional[LRStats] = None):
+    with phase(stats, "lr1_context"):
+        ctx = LR1Context(prods, start, FIRST, terminals, nonterminals)
+    aug, S_, terms = ctx.aug, ctx.S_, ctx.terms
+    succ, key_of = successors, core_key
+    if stats is not None:
+        closure_fn, succ, key_of = _instrument(stats, closure_fn, core_key)
+    kernels = [{(len(aug) - 1, 0): ctx.term_bit[END]}]
+    items: List[Dict[Core, int]] = [{}]
+    by_core = {core_key(kernels[0]): 0}
+    trans = {}
+    queue = deque([0])
+    queued = {0}
+    dup = regrown = 0
+    while queue:
+        i = queue.popleft()
+        queued.discard(i)
+        items[i] = closure_fn(kernels[i], ctx)
+        moves = succ(items[i], aug)
+        for X in sorted(moves):
+            kern = moves[X]
+            key = key_of(kern)
+            j = by_core.get(key)
+            if j is None:
+                j = by_core[key] = len(kernels)
+                kernels.append(dict(kern))
+                items.append({})
+                grown = True
+            else:
+                dup += 1
+                grown = _absorb(kernels[j], kern)
+                regrown += grown
+            trans[(i, X)] = j
+            if grown and j not in queued:
+                queue.append(j)
+                queued.add(j)
+    C = [ItemSet(kernel_key(K), I, terms) for K, I in zip(kernels, items)]
+    if stats is not None:
+        stats.add("states", len(C))
+        stats.add("duplicate_states", dup)
+        stats.add("lookahead_propagations", regrown)
+    return C, {I.kernel: i for i, I in enumerate(C)}, aug, S_, trans
+
+def state_actions(I: ItemSet, shift_syms, aug, terminals):
+    cells: Dict[str, set] = {}
+    accept = len(aug) - 1
+    for la, (kind, pidx) in I.reductions(aug, aug[accept][0]):
+        cells.setdefault(la, set()).add(accept if kind == 'accept' else pidx)
+    for X in shift_syms:
+        if X in terminals:
+            cells.setdefault(X, set()).add(-1)
+    return cells
+
+def _split_on_conflicts(block, acts):
+    parts = []
+    for s in block:
+        for members, cells, known in parts:
+            ok = True
+            for t, a in acts[s].items():
+                combined = cells.get(t, frozenset()) | a
+                if len(combined) > 1 and combined != a and combined not in known.get(t, ()):
+                    ok = False
+                    break
+            if ok:
+                break
+        else:
+            members, cells, known = [], {}, {}
+            parts.append((members, cells, known))
+        members.append(s)
+        for t, a in acts[s].items():
+            cells[t] = cells.get(t, frozenset()) | a
+            if len(a) > 1:
+                known.setdefault(t, set()).add(frozenset(a))
+    return [members for members, _, _ in parts]
+
+def minimal_collection(prods, start, FIRST, terminals, nonterminals, closure_fn=closure, stats: Optional[LRStats] = None,
+                       canonical_fn=canonical_collection, actions_fn=None):
+    C, _, aug, S_, trans = canonical_fn(prods, start, FIRST, terminals, nonterminals, closure_fn, stats)
+    with phase(stats, "state_merging"):
+        acts = actions_fn(terminals) if actions_fn else None
+        merged, index, merged_trans = _merge_minimal(C, aug, terminals, trans, acts)
+    if stats is not None:
+        stats.add("merged_states", len(C) - len(merged))
+    return merged, index, aug, S_, merged_trans
+
+def _merge_minimal(C, aug, terminals, trans, acts=None):
+    out: Dict[int, Dict[str, int]] = {}
+    for (i, X), j in trans.items():
+        out.setdefault(i, {})[X] = j
+    if acts is None:
+        acts = [state_actions(I, out.get(i, ()), aug, terminals) for i, I in enumerate(C)]
+    groups: Dict[tuple, List[int]] = {}
+    for i, I in enumerate(C):
+        groups.setdefault(core_key(dict(I.kernel)), []).append(i)
+    blocks = list(groups.values())
+    while True:
+        blocks = [part for blk in blocks for part in _split_on_conflicts(blk, acts)]
+        block_of = {s: b for b, blk in enumerate(blocks) for s in blk}
+        refined = []
+        for blk in blocks:
+            parts: Dict[tuple, List[int]] = {}
+            for s in blk:
+                moves = out.get(s, {})
+                parts.setdefault(tuple(block_of[moves[X]] for X in sorted(moves)), []).append(s)
+            refined.extend(parts.values())
+        if len(refined) == len(blocks):
+            break
+        blocks = refined
+    blocks.sort(key=min)
+    block_of = {s: b for b, blk in enumerate(blocks) for s in blk}
+    merged = []
+    index = {}
+    for b, blk in enumerate(blocks):
+        kernel: Dict[Core, int] = {}
+        items: Dict[Core, int] = {}
+        for s in blk:
+            for core, mask in C[s].kernel:
+                kernel[core] = kernel.get(core, 0) | mask
+            for core, mask in C[s].items.items():
+                items[core] = items.get(core, 0) | mask
+        I = ItemSet(kernel_key(kernel), items, C[0].terms)
+        index[I.kernel] = b
+        merged.append(I)
+    merged_trans = {(block_of[i], X): block_of[j] for (i, X), j in trans.items()}
+    return merged, index, merged_trans
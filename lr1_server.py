@@ -0,0 +1,289 @@
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+from compiled_tables import CompiledTables
+from grammar import parse_grammar_text, parse_precedence
+from parser_tables import MODES
+from table_cache import TableCache, grammar_hash
+from lr_driver import parse_tokens
+from error_recovery import parse_with_recovery
+from parse_tree import tree_to_json
+from lr_stats import LRStats
+
+DEFAULT_PORT = 8765
+MAX_LINE = 16 << 20
+INLINE_TOKENS = 1024
+MAX_REPAIR_COST = 3
+
+@dataclass
+class WarmGrammar:
+    key: str
+    tables: CompiledTables
+    aug: list
+    conflicts: List[str]
+    uses: int = 0
+
+class GrammarPool:
+    def __init__(self, max_entries: int = 32, cache: Optional[TableCache] = None, stats: Optional[LRStats] = None):
+        self.max_entries = max_entries
+        self.cache = cache
+        self.stats = stats if stats is not None else LRStats()
+        self._entries: "OrderedDict[str, WarmGrammar]" = OrderedDict()
+        self._by_text: Dict[Tuple[str, str, bool], str] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get(self, key: str) -> Optional[WarmGrammar]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key: str) -> Optional[WarmGrammar]:
+        with self._lock:
+            return self._get(key)
+
+    def lookup(self, text: str, mode: str = "lalr", unit_elim: bool = False) -> Optional[WarmGrammar]:
+        with self._lock:
+            key = self._by_text.get((text, mode, unit_elim))
+            return self._get(key) if key is not None else None
+
+    def load(self, text: str, mode: str = "lalr", unit_elim: bool = False) -> WarmGrammar:
+        from parser_lr1 import build_parser
+        if mode not in MODES:
+            raise ValueError(f"Modo de tabla desconocido: {mode} (usa {', '.join(MODES)})")
+        entry = self.lookup(text, mode, unit_elim)
+        if entry is not None:
+            self.stats.add("pool_hits")
+            return entry
+        self.stats.add("pool_misses")
+        with self.stats.phase("build"):
+            prods, start, nts, ts = parse_grammar_text(text)
+            precedence = parse_precedence(text)
+            key = grammar_hash(prods, start, mode, precedence, unit_elim)
+            entry = self.get(key)
+            if entry is None:
+                ACTION, _, _, aug, conflicts = build_parser(prods, start, nts, ts, mode=mode, cache=self.cache or False,
+                                                            precedence=precedence, unit_elim=unit_elim)
+                entry = WarmGrammar(key, ACTION.tables, aug, conflicts)
+        with self._lock:
+            entry = self._entries.setdefault(key, entry)
+            self._entries.move_to_end(key)
+            self._by_text[(text, mode, unit_elim)] = key
+            while len(self._entries) > self.max_entries:
+                old, _ = self._entries.popitem(last=False)
+                self._by_text = {k: v for k, v in self._by_text.items() if v != old}
+        return entry
+
+def parse_request(entry: WarmGrammar, tokens: List[str], tree: bool = False, recover: Optional[dict] = None) -> dict:
+    entry.uses += 1
+    if recover is not None:
+        r = parse_with_recovery(tokens, entry.tables, **recover)
+        return {"accepted": r.accepted, "completed": r.completed, "errors": [asdict(e) for e in r.errors]}
+    r = parse_tokens(tokens, entry.tables, tree=tree)
+    out = {"accepted": r.accepted, "pos": r.pos, "token": r.token}
+    if not r.accepted:
+        out["expected"] = list(entry.tables.expected(r.state))
+    if tree and r.tree is not None:
+        out["tree"] = tree_to_json(r.tree)
+    return out
+
+def _str_list(value, name: str) -> List[str]:
+    if not isinstance(value, list) or not all(isinstance(t, str) for t in value):
+        raise ValueError(f"'{name}' debe ser una lista de cadenas")
+    return value
+
+def _encode_line(out: dict) -> bytes:
+    return json.dumps(out, ensure_ascii=False).encode("utf-8") + b"\n"
+
+def _timed_parse(entry: WarmGrammar, tokens: List[str], tree: bool, recover: Optional[dict]) -> Tuple[dict, float]:
+    t0 = time.perf_counter()
+    out = parse_request(entry, tokens, tree, recover)
+    return out, time.perf_counter() - t0
+
+class ParseServer:
+    def __init__(self, pool: Optional[GrammarPool] = None, build_workers: int = 1, parse_workers: int = 2,
+                 max_tokens: int = 1_000_000):
+        self.pool = pool or GrammarPool()
+        self.stats = self.pool.stats
+        self.max_tokens = max_tokens
+        self.executor = ThreadPoolExecutor(max_workers=build_workers)
+        self.parse_executor = ThreadPoolExecutor(max_workers=parse_workers)
+        self._building: Dict[Tuple[str, str, bool], asyncio.Future] = {}
+        self.started = time.time()
+
+    async def _load(self, text: str, mode: str, unit_elim: bool) -> WarmGrammar:
+        entry = self.pool.lookup(text, mode, unit_elim)
+        if entry is not None:
+            self.stats.add("pool_hits")
+            return entry
+        k = (text, mode, unit_elim)
+        fut = self._building.get(k)
+        if fut is None:
+            fut = asyncio.get_running_loop().run_in_executor(self.executor, self.pool.load, text, mode, unit_elim)
+            self._building[k] = fut
+            fut.add_done_callback(lambda _: self._building.pop(k, None))
+        return await asyncio.shield(fut)
+
+    async def _grammar(self, req: dict) -> WarmGrammar:
+        if "grammar" in req:
+            return await self._load(req["grammar"], req.get("mode", "lalr"), bool(req.get("unit_elim")))
+        if "hash" in req:
+            entry = self.pool.get(req["hash"])
+            if entry is None:
+                raise KeyError(req["hash"])
+            self.stats.add("pool_hits")
+            return entry
+        raise ValueError("La petición necesita 'grammar' o 'hash'")
+
+    async def dispatch(self, req: dict) -> dict:
+        op = req.get("op", "parse")
+        self.stats.add("requests")
+        if op == "ping":
+            return {}
+        if op == "load":
+            entry = await self._grammar(req)
+            return {"hash": entry.key, "states": entry.tables.nstates, "conflicts": entry.conflicts}
+        if op == "parse":
+            entry = await self._grammar(req)
+            if "tokens" in req:
+                tokens = _str_list(req["tokens"], "tokens")
+            else:
+                text = req.get("input", "")
+                if not isinstance(text, str):
+                    raise ValueError("'input' debe ser una cadena")
+                tokens = text.split()
+            if len(tokens) > self.max_tokens:
+                raise ValueError(f"Entrada demasiado larga: {len(tokens)} tokens (máximo {self.max_tokens})")
+            recover = None
+            if req.get("recover"):
+                sync = req.get("sync")
+                max_cost = req.get("max_cost", 1)
+                if type(max_cost) is not int or not 0 <= max_cost <= MAX_REPAIR_COST:
+                    raise ValueError(f"'max_cost' debe ser un entero entre 0 y {MAX_REPAIR_COST}")
+                recover = dict(sync=None if sync is None else _str_list(sync, "sync"), repair=max_cost > 0,
+                               max_cost=max_cost)
+            args = (entry, tokens, bool(req.get("tree")), recover)
+            if len(tokens) <= INLINE_TOKENS:
+                out, seconds = _timed_parse(*args)
+            else:
+                out, seconds = await asyncio.get_running_loop().run_in_executor(self.parse_executor, _timed_parse, *args)
+            self.stats.timers["parse"] += seconds
+            self.stats.add("parses")
+            self.stats.add("tokens", len(tokens))
+            out["hash"] = entry.key
+            return out
+        if op == "stats":
+            return {"grammars": len(self.pool), "uptime": time.time() - self.started, **self.stats.as_dict()}
+        raise ValueError(f"Operación desconocida: {op}")
+
+    async def reply(self, line: bytes) -> dict:
+        req = {}
+        try:
+            req = json.loads(line)
+            if not isinstance(req, dict):
+                raise ValueError("Se esperaba un objeto JSON")
+            out = await self.dispatch(req)
+            out["ok"] = True
+        except KeyError as e:
+            out = {"ok": False, "error": f"gramática o campo no encontrado: {e.args[0]}"}
+        except (ValueError, TypeError) as e:
+            out = {"ok": False, "error": str(e)}
+        except Exception as e:
+            out = {"ok": False, "error": f"error inesperado: {e!r}"}
+        if not out["ok"]:
+            self.stats.add("errors")
+        if isinstance(req, dict) and "id" in req:
+            out["id"] = req["id"]
+        return out
+
+    async def _encode(self, out: dict) -> bytes:
+        tree = out.get("tree")
+        if tree is not None and len(tree["sym"]) > INLINE_TOKENS:
+            return await asyncio.get_running_loop().run_in_executor(self.parse_executor, _encode_line, out)
+        return _encode_line(out)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.stats.add("connections")
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    writer.write(b'{"ok": false, "error": "l\\u00ednea demasiado larga"}\n')
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                out = await self.reply(line)
+                writer.write(await self._encode(out))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def start(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT, unix: Optional[str] = None):
+        if unix:
+            return await asyncio.start_unix_server(self.handle, path=unix, limit=MAX_LINE)
+        return await asyncio.start_server(self.handle, host, port, limit=MAX_LINE)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.parse_executor.shutdown(wait=False)
+
+async def serve(host: str = "127.0.0.1", port: int = DEFAULT_PORT, unix: Optional[str] = None,
+                preload: Optional[List[Tuple[str, str]]] = None, pool: Optional[GrammarPool] = None, ready=None):
+    server = ParseServer(pool)
+    for text, mode in preload or ():
+        entry = await server._load(text, mode, False)
+        print(f"precargada {entry.key[:12]} ({mode}, {entry.tables.nstates} estados)", file=sys.stderr)
+    srv = await server.start(host, port, unix)
+    where = unix or ", ".join(f"{s.getsockname()[0]}:{s.getsockname()[1]}" for s in srv.sockets)
+    print(f"escuchando en {where}", file=sys.stderr)
+    if ready is not None:
+        ready(srv)
+    try:
+        async with srv:
+            await srv.serve_forever()
+    finally:
+        server.close()
+
+def main(argv=None):
+    from table_cache import default_cache
+    ap = argparse.ArgumentParser(description="Servidor de análisis LR: JSON por líneas sobre un socket, con gramáticas compiladas en memoria.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    ap.add_argument("--unix", default=None, help="ruta de un socket Unix en lugar de TCP")
+    ap.add_argument("--max-grammars", type=int, default=32, help="gramáticas compiladas que se mantienen en memoria")
+    ap.add_argument("--no-disk-cache", action="store_true", help="no usar la caché de tablas en disco")
+    ap.add_argument("--preload", nargs="*", default=[], help="archivos de gramática que se compilan al arrancar")
+    ap.add_argument("--mode", choices=list(MODES), default="lalr", help="modo de las gramáticas precargadas")
+    args = ap.parse_args(argv)
+    preload = []
+    for path in args.preload:
+        with open(path, encoding="utf-8") as f:
+            preload.append((f.read(), args.mode))
+    pool = GrammarPool(args.max_grammars, None if args.no_disk_cache else default_cache())
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix, preload, pool))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
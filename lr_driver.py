@@ -0,0 +1,278 @@
+import time
+from array import array
+from collections import deque
+from dataclasses import dataclass
+from itertools import chain
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+from grammar import EPS, END
+from compiled_tables import CompiledTables
+from parse_tree import ParseTreeArena, TreeNode
+from lr_stats import LRStats
+
+SHIFT, REDUCE, ACCEPT, ERROR_ACTION, ERROR_GOTO = range(5)
+
+TRACE_COLUMNS = ["Pila (estados || símbolos)", "Entrada", "Acción"]
+
+class Trace:
+    def __init__(self):
+        self.ops = array("i")
+        self.tokens: List[str] = []
+
+    def __len__(self):
+        return len(self.ops) // 3
+
+    def rows(self):
+        ops = self.ops
+        for i in range(0, len(ops), 3):
+            yield ops[i], ops[i + 1], ops[i + 2]
+
+    def frames(self, aug, start: int = 0, stop: Optional[int] = None, split_goto: bool = False,
+               width: Optional[int] = None):
+        tokens = self.tokens
+        def tail(xs):
+            if width is not None and len(xs) > width:
+                xs = ["…"] + xs[-width:]
+            return " ".join(map(str, xs))
+        states = [0]
+        syms: List[str] = []
+        pos = 0
+        out = []
+        for n, (op, a, b) in enumerate(self.rows()):
+            if stop is not None and n >= stop:
+                break
+            show = n >= start
+            if show:
+                stack_show = f"{tail(states)} || {tail(syms)}"
+                rest = tokens[pos:] if width is None else tokens[pos:pos + width + 1]
+                inp_show = " ".join(rest if width is None or len(rest) <= width else rest[:width] + ["…"])
+            if op == SHIFT:
+                if show:
+                    out.append((stack_show, inp_show, f"shift -> s{a}"))
+                states.append(a)
+                syms.append(tokens[pos])
+                pos += 1
+            elif op == REDUCE:
+                H, B = aug[a]
+                if B:
+                    del states[-len(B):]
+                    del syms[-len(B):]
+                states.append(b)
+                syms.append(H)
+                if show:
+                    rhs = ' '.join(B) if B else EPS
+                    if split_goto:
+                        out.append((stack_show, inp_show, f"reduce {H} → {rhs}"))
+                        out.append((f"{tail(states)} || {tail(syms)}", inp_show, f"goto s{b}"))
+                    else:
+                        out.append((stack_show, inp_show, f"reduce {H} → {rhs}; goto s{b}"))
+            elif show:
+                if op == ACCEPT:
+                    out += [(stack_show, inp_show, "ACCEPT"), ("", "", "CADENA VÁLIDA")]
+                elif op == ERROR_ACTION:
+                    out += [(stack_show, inp_show, f"Error: no ACTION[{a}, {tokens[pos]}]"), ("", "", "CADENA NO VÁLIDA")]
+                else:
+                    H, B = aug[b]
+                    if split_goto:
+                        out.append((stack_show, inp_show, f"reduce {H} → {' '.join(B) if B else EPS}"))
+                    out += [(stack_show, inp_show, f"Error: no GOTO[{a}, {H}]"), ("", "", "CADENA NO VÁLIDA")]
+        return out
+
+    def to_frame(self, aug, start: int = 0, stop: Optional[int] = None, split_goto: bool = False,
+                 width: Optional[int] = None):
+        import pandas as pd
+        return pd.DataFrame(self.frames(aug, start, stop, split_goto, width), columns=TRACE_COLUMNS)
+
+@dataclass
+class ParseResult:
+    accepted: bool
+    pos: int
+    token: Optional[str]
+    state: int
+    steps: int
+    trace: Optional[Trace] = None
+    tree: Optional[TreeNode] = None
+
+def parse_tokens(tokens: Iterable[str], tables: CompiledTables, trace: bool = False, tree: bool = False,
+                 stats: Optional[LRStats] = None) -> ParseResult:
+    if stats is None:
+        return _parse(tokens, tables, trace, tree, False)[0]
+    t0 = time.perf_counter()
+    result, depth = _parse(tokens, tables, trace, tree, True)
+    stats.timers["parse"] += time.perf_counter() - t0
+    stats.add("parses")
+    stats.add("accepted", result.accepted)
+    stats.add("shifts", result.pos)
+    stats.add("reduces", result.steps - result.pos - 1)
+    stats.peak("max_stack_depth", depth)
+    return result
+
+def _parse(tokens: Iterable[str], tables: CompiledTables, trace: bool, tree: bool, track: bool) -> Tuple[ParseResult, int]:
+    T = tables
+    base, table, check = T.base, T.table, T.check
+    defred, defmask = T.defred, T.defmask
+    gbase, gtable, gcheck = T.gbase, T.gtable, T.gcheck
+    prod_lhs, prod_len = T.prod_lhs, T.prod_len
+    term_id, accept = T.term_id, T.accept
+    chains = tree and T.unit_chains
+    tr = Trace() if trace else None
+    arena = ParseTreeArena() if tree else None
+    nodes: List[int] = []
+    rec = tr.ops.extend if trace else None
+    it = chain(tokens, (END,))
+    tok = next(it)
+    if trace:
+        tr.tokens.append(tok)
+    t = term_id.get(tok, -1)
+    stack = [0]
+    pos = steps = depth = 0
+    while True:
+        s = stack[-1]
+        steps += 1
+        if t < 0:
+            act = 0
+        else:
+            i = base[s] + t
+            if check[i] == s:
+                act = table[i]
+            elif defmask[s] >> t & 1:
+                act = defred[s]
+            else:
+                act = 0
+        if act > 0:
+            stack.append(act - 1)
+            if track and len(stack) > depth:
+                depth = len(stack)
+            if trace:
+                rec((SHIFT, act - 1, 0))
+            if tree:
+                nodes.append(arena.add_leaf(tok, pos))
+            pos += 1
+            tok = next(it)
+            if trace:
+                tr.tokens.append(tok)
+            t = term_id.get(tok, -1)
+        elif act == 0:
+            if trace:
+                rec((ERROR_ACTION, s, 0))
+                tr.tokens.extend(it)
+            return ParseResult(False, pos, tok, s, steps, tr), depth
+        elif act == accept:
+            if trace:
+                rec((ACCEPT, 0, 0))
+            root = arena.node(nodes[-1]) if tree and nodes else None
+            return ParseResult(True, pos, None, s, steps, tr, root), depth
+        else:
+            p = -act - 1
+            k = prod_len[p]
+            if k:
+                del stack[-k:]
+            s2 = stack[-1]
+            j = gbase[s2] + prod_lhs[p]
+            if gcheck[j] != s2:
+                if trace:
+                    rec((ERROR_GOTO, s2, p))
+                    tr.tokens.extend(it)
+                return ParseResult(False, pos, tok, s2, steps, tr), depth
+            stack.append(gtable[j])
+            if track and len(stack) > depth:
+                depth = len(stack)
+            if trace:
+                rec((REDUCE, p, gtable[j]))
+            if tree:
+                arena.reduce(T.nonterms[prod_lhs[p]], nodes, k, pos)
+                if chains:
+                    for u in T.unit_chain(s2, prod_lhs[p], t):
+                        arena.reduce(T.nonterms[prod_lhs[u]], nodes, 1, pos)
+
+def iter_tokens(chunks: Iterable[str]) -> Iterator[str]:
+    pending = ""
+    for chunk in chunks:
+        if not chunk:
+            continue
+        data = pending + chunk
+        parts = data.split()
+        pending = "" if data[-1].isspace() or not parts else parts.pop()
+        yield from parts
+    if pending:
+        yield pending
+
+def read_chunks(f, size: int = 1 << 16) -> Iterator[str]:
+    return iter(lambda: f.read(size), "")
+
+Reduction = Tuple[int, int, int]
+
+class PushParser:
+    def __init__(self, tables: CompiledTables, on_reduce: Optional[Callable[[int, int, int], None]] = None):
+        self.tables = tables
+        self.on_reduce = on_reduce
+        self.stack = [0]
+        self.starts = [0]
+        self.pos = 0
+        self.steps = 0
+        self.result: Optional[ParseResult] = None
+        self.pending: "deque[Reduction]" = deque()
+
+    def feed(self, tokens: Iterable[str]) -> bool:
+        if self.result is not None:
+            return False
+        for tok in tokens:
+            if not self._push(tok):
+                return False
+        return self.result is None
+
+    def finish(self) -> ParseResult:
+        if self.result is None:
+            self._push(END)
+        return self.result
+
+    def drain(self) -> Iterator[Reduction]:
+        pending = self.pending
+        while pending:
+            yield pending.popleft()
+
+    def stream(self, tokens: Iterable[str]) -> Iterator[Reduction]:
+        for tok in tokens:
+            ok = self._push(tok)
+            yield from self.drain()
+            if not ok:
+                return
+        self.finish()
+        yield from self.drain()
+
+    def _push(self, tok: str) -> bool:
+        T = self.tables
+        stack, starts = self.stack, self.starts
+        t = T.term_id.get(tok, -1)
+        while True:
+            s = stack[-1]
+            self.steps += 1
+            act = T.action_code(s, t) if t >= 0 else 0
+            if act > 0:
+                stack.append(act - 1)
+                starts.append(self.pos)
+                self.pos += 1
+                return True
+            if act == 0:
+                self.result = ParseResult(False, self.pos, tok, s, self.steps)
+                return False
+            if act == T.accept:
+                self.result = ParseResult(True, self.pos, None, s, self.steps)
+                return True
+            p = -act - 1
+            k = T.prod_len[p]
+            start = starts[-k] if k else self.pos
+            if k:
+                del stack[-k:]
+                del starts[-k:]
+            s2 = stack[-1]
+            g = T.goto_state(s2, T.prod_lhs[p])
+            if g < 0:
+                self.result = ParseResult(False, self.pos, tok, s2, self.steps)
+                return False
+            stack.append(g)
+            starts.append(start)
+            for q in (p,) + (T.unit_chain(s2, T.prod_lhs[p], t) if T.unit_chains else ()):
+                if self.on_reduce is not None:
+                    self.on_reduce(q, start, self.pos)
+                else:
+                    self.pending.append((q, start, self.pos))
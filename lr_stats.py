@@ -0,0 +1,54 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, List, Optional, Tuple
+
+class LRStats:
+    def __init__(self):
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.timers: Dict[str, float] = defaultdict(float)
+
+    def add(self, name: str, n: int = 1):
+        self.counters[name] += n
+
+    def peak(self, name: str, value: int):
+        if value > self.counters[name]:
+            self.counters[name] = value
+
+    @contextmanager
+    def phase(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[name] += time.perf_counter() - t0
+
+    def timed(self, name: str, fn: Callable, size: Optional[Tuple[str, Callable]] = None) -> Callable:
+        counters, timers, clock = self.counters, self.timers, time.perf_counter
+        calls = name + "_calls"
+        def wrapper(*args):
+            t0 = clock()
+            out = fn(*args)
+            timers[name] += clock() - t0
+            counters[calls] += 1
+            if size is not None:
+                counters[size[0]] += size[1](out)
+            return out
+        return wrapper
+
+    def clear(self):
+        self.counters.clear()
+        self.timers.clear()
+
+    def rows(self) -> List[Tuple[str, str]]:
+        out = [(k, f"{v:,}") for k, v in sorted(self.counters.items())]
+        out += [(k, f"{v * 1000:.2f} ms") for k, v in sorted(self.timers.items())]
+        if self.timers.get("parse") and self.counters.get("shifts"):
+            out.append(("tokens_per_second", f"{self.counters['shifts'] / self.timers['parse']:,.0f}"))
+        return out
+
+    def as_dict(self):
+        return {"counters": dict(self.counters), "seconds": dict(self.timers)}
+
+def phase(stats: Optional[LRStats], name: str):
+    return stats.phase(name) if stats is not None else nullcontext()
@@ -1,5 +1,6 @@
+from array import array
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional, TextIO
 
 @dataclass
 class PTNode:
@@ -7,29 +8,188 @@ class PTNode:
     children: List["PTNode"]
     id: Optional[int] = None
 
-def _next_id():
-    _next_id.counter += 1
-    return _next_id.counter
-
-_next_id.counter = 0
-
-def tree_to_dot(root: PTNode) -> str:
-    lines = ["digraph G {", 'node [shape=ellipse];']
-    def walk(n: PTNode):
-        if n.id is None:
-            n.id = _next_id()
-        lines.append(f'  n{n.id} [label="{n.label}"];')
-        for ch in n.children:
-            if ch.id is None:
-                ch.id = _next_id()
-            lines.append(f'  n{n.id} -> n{ch.id};')
-            walk(ch)
-    walk(root)
-    lines.append("}")
-    return "\n".join(lines)
-
-def tree_to_pretty_text(root: PTNode, indent: str = "") -> str:
-    s = indent + root.label + "\n"
-    for ch in root.children:
-        s += tree_to_pretty_text(ch, indent + "  ")
-    return s
+class ParseTreeArena:
+    def __init__(self):
+        self.labels: List[str] = []
+        self.label_id: Dict[str, int] = {}
+        self.sym = array("i")
+        self.first_child = array("i")
+        self.next_sibling = array("i")
+        self.span_start = array("i")
+        self.span_end = array("i")
+
+    def __len__(self):
+        return len(self.sym)
+
+    def _new(self, label: str, first: int, start: int, end: int) -> int:
+        sid = self.label_id.get(label)
+        if sid is None:
+            sid = self.label_id[label] = len(self.labels)
+            self.labels.append(label)
+        self.sym.append(sid)
+        self.first_child.append(first)
+        self.next_sibling.append(-1)
+        self.span_start.append(start)
+        self.span_end.append(end)
+        return len(self.sym) - 1
+
+    def add_leaf(self, label: str, pos: int) -> int:
+        return self._new(label, -1, pos, pos + 1)
+
+    def reduce(self, label: str, stack: List[int], k: int, pos: int) -> int:
+        if not k:
+            i = self._new(label, -1, pos, pos)
+        else:
+            n = len(stack)
+            nxt = self.next_sibling
+            for a in range(n - k, n - 1):
+                nxt[stack[a]] = stack[a + 1]
+            i = self._new(label, stack[n - k], self.span_start[stack[n - k]], self.span_end[stack[-1]])
+            del stack[n - k:]
+        stack.append(i)
+        return i
+
+    def child_ids(self, i: int) -> Iterator[int]:
+        c = self.first_child[i]
+        while c >= 0:
+            yield c
+            c = self.next_sibling[c]
+
+    def node(self, i: int) -> "TreeNode":
+        return TreeNode(self, i)
+
+class TreeNode:
+    __slots__ = ("arena", "index")
+
+    def __init__(self, arena: ParseTreeArena, index: int):
+        self.arena = arena
+        self.index = index
+
+    @property
+    def id(self) -> int:
+        return self.index
+
+    @property
+    def label(self) -> str:
+        return self.arena.labels[self.arena.sym[self.index]]
+
+    @property
+    def children(self) -> List["TreeNode"]:
+        return [TreeNode(self.arena, c) for c in self.arena.child_ids(self.index)]
+
+    @property
+    def span(self):
+        return self.arena.span_start[self.index], self.arena.span_end[self.index]
+
+    def __eq__(self, other):
+        return isinstance(other, TreeNode) and other.arena is self.arena and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.arena), self.index))
+
+    def __repr__(self):
+        return f"TreeNode({self.label!r}, span={self.span})"
+
+def _dot_label(label: str) -> str:
+    return label.replace("\\", "\\\\").replace('"', '\\"')
+
+def iter_dot(root, max_nodes: Optional[int] = None, max_depth: Optional[int] = None) -> Iterator[str]:
+    yield "digraph G {"
+    yield 'node [shape=ellipse];'
+    yield f'  n0 [label="{_dot_label(root.label)}"];'
+    count = 1
+    stack = []
+    kids = root.children
+    if kids and max_depth is not None and max_depth <= 1:
+        yield '  n0 -> n0_more;'
+        yield f'  n0_more [shape=plaintext, label="… {len(kids)} hijos"];'
+    else:
+        stack.append((0, 0, iter(kids)))
+    while stack:
+        nid, depth, kids = stack[-1]
+        ch = next(kids, None)
+        if ch is None:
+            stack.pop()
+            continue
+        if max_nodes is not None and count >= max_nodes:
+            yield f'  truncated [shape=box, label="… árbol truncado ({count} nodos mostrados)"];'
+            break
+        cid = count
+        count += 1
+        yield f'  n{nid} -> n{cid};'
+        yield f'  n{cid} [label="{_dot_label(ch.label)}"];'
+        grandkids = ch.children
+        if not grandkids:
+            continue
+        if max_depth is not None and depth + 2 >= max_depth:
+            yield f'  n{cid} -> n{cid}_more;'
+            yield f'  n{cid}_more [shape=plaintext, label="… {len(grandkids)} hijos"];'
+        else:
+            stack.append((cid, depth + 1, iter(grandkids)))
+    yield "}"
+
+def iter_pretty_text(root, indent: str = "", max_nodes: Optional[int] = None, max_depth: Optional[int] = None) -> Iterator[str]:
+    stack = [(root, 0)]
+    count = 0
+    while stack:
+        node, depth = stack.pop()
+        if max_nodes is not None and count >= max_nodes:
+            yield f"{indent}… árbol truncado ({count} nodos mostrados)\n"
+            return
+        count += 1
+        yield f"{indent}{'  ' * depth}{node.label}\n"
+        kids = node.children
+        if not kids:
+            continue
+        if max_depth is not None and depth + 1 >= max_depth:
+            yield f"{indent}{'  ' * (depth + 1)}… {len(kids)} hijos\n"
+        else:
+            stack.extend((ch, depth + 1) for ch in reversed(kids))
+
+def write_dot(root, out: TextIO, max_nodes: Optional[int] = None, max_depth: Optional[int] = None):
+    for line in iter_dot(root, max_nodes, max_depth):
+        out.write(line + "\n")
+
+def write_pretty_text(root, out: TextIO, max_nodes: Optional[int] = None, max_depth: Optional[int] = None):
+    out.writelines(iter_pretty_text(root, "", max_nodes, max_depth))
+
+def tree_to_dot(root, max_nodes: Optional[int] = None, max_depth: Optional[int] = None) -> str:
+    return "\n".join(iter_dot(root, max_nodes, max_depth))
+
+def tree_to_pretty_text(root, indent: str = "", max_nodes: Optional[int] = None, max_depth: Optional[int] = None) -> str:
+    return "".join(iter_pretty_text(root, indent, max_nodes, max_depth))
+
+def _arena_json(arena: ParseTreeArena, root: int) -> dict:
+    first, nxt = arena.first_child, arena.next_sibling
+    order = [root]
+    child_start = [1]
+    for i in order:
+        c = first[i]
+        while c >= 0:
+            order.append(c)
+            c = nxt[c]
+        child_start.append(len(order))
+    sym, starts, ends = arena.sym, arena.span_start, arena.span_end
+    return {"labels": list(arena.labels), "sym": [sym[i] for i in order], "start": [starts[i] for i in order],
+            "end": [ends[i] for i in order], "child_start": child_start}
+
+def tree_to_json(root) -> dict:
+    if isinstance(root, TreeNode):
+        return _arena_json(root.arena, root.index)
+    labels: List[str] = []
+    label_id: Dict[str, int] = {}
+    sym, start, end = [], [], []
+    order = [root]
+    child_start = [1]
+    for node in order:
+        sid = label_id.get(node.label)
+        if sid is None:
+            sid = label_id[node.label] = len(labels)
+            labels.append(node.label)
+        sym.append(sid)
+        a, b = node.span
+        start.append(a)
+        end.append(b)
+        order.extend(node.children)
+        child_start.append(len(order))
+    return {"labels": labels, "sym": sym, "start": start, "end": end, "child_start": child_start}
@@ -0,0 +1,123 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
+from compiled_tables import CompiledTables, to_bytes, from_buffer
+from lr_driver import parse_tokens
+from error_recovery import parse_with_recovery
+
+@dataclass
+class BatchResult:
+    index: int
+    accepted: bool
+    pos: int
+    token: Optional[str]
+    seconds: float
+    errors: Optional[List[dict]] = None
+
+_worker_tables: Optional[CompiledTables] = None
+
+def _init_worker(blob: bytes):
+    global _worker_tables
+    _worker_tables = from_buffer(blob)[0]
+
+def _parse_chunk(first: int, lines: List[str], tables: Optional[CompiledTables] = None,
+                 recover: Optional[dict] = None) -> List[Tuple]:
+    tables = tables or _worker_tables
+    clock = time.perf_counter
+    out = []
+    for i, line in enumerate(lines, first):
+        t0 = clock()
+        if recover is None:
+            r = parse_tokens(line.split(), tables)
+            out.append((i, r.accepted, r.pos, r.token, clock() - t0))
+        else:
+            r = parse_with_recovery(line.split(), tables, **recover)
+            e = r.errors[0] if r.errors else None
+            out.append((i, r.accepted, e.pos if e else len(line.split()), e.token if e else None, clock() - t0,
+                        [asdict(e) for e in r.errors]))
+    return out
+
+def _chunks(inputs: Iterable[str], size: int) -> Iterator[Tuple[int, List[str]]]:
+    it = iter(inputs)
+    first = 0
+    while True:
+        lines = list(islice(it, size))
+        if not lines:
+            return
+        yield first, lines
+        first += len(lines)
+
+def parse_batch(inputs: Iterable[str], tables: CompiledTables, workers: Optional[int] = None,
+                chunksize: int = 2048, recover: Optional[dict] = None) -> Iterator[BatchResult]:
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for first, lines in _chunks(inputs, chunksize):
+            for row in _parse_chunk(first, lines, tables, recover):
+                yield BatchResult(*row)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(to_bytes(tables),)) as pool:
+        inflight = deque()
+        for first, lines in _chunks(inputs, chunksize):
+            inflight.append(pool.submit(_parse_chunk, first, lines, None, recover))
+            if len(inflight) >= 4 * workers:
+                for row in inflight.popleft().result():
+                    yield BatchResult(*row)
+        while inflight:
+            for row in inflight.popleft().result():
+                yield BatchResult(*row)
+
+def main(argv=None):
+    from grammar import parse_grammar_text, parse_precedence
+    from parser_tables import MODES
+    from parser_lr1 import build_parser
+    ap = argparse.ArgumentParser(description="Analiza un archivo de cadenas (una por línea) con una gramática LR.")
+    ap.add_argument("grammar", help="archivo con la gramática")
+    ap.add_argument("inputs", help="archivo con una cadena por línea ('-' para stdin)")
+    ap.add_argument("--mode", choices=list(MODES), default="canonical")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--chunk", type=int, default=2048)
+    ap.add_argument("--json", action="store_true", help="una línea JSON por cadena")
+    ap.add_argument("--recover", action="store_true", help="recupera errores y los informa todos")
+    ap.add_argument("--sync", nargs="*", default=None, help="tokens de sincronización del modo pánico")
+    ap.add_argument("--max-cost", type=int, default=1, help="coste máximo de la reparación local (0 = solo pánico)")
+    args = ap.parse_args(argv)
+    recover = None
+    if args.recover:
+        recover = dict(sync=args.sync, repair=args.max_cost > 0, max_cost=args.max_cost)
+    with open(args.grammar, encoding="utf-8") as f:
+        text = f.read()
+    prods, start, nts, ts = parse_grammar_text(text)
+    ACTION, _, _, _, conflicts = build_parser(prods, start, nts, ts, mode=args.mode,
+                                              precedence=parse_precedence(text))
+    for c in conflicts:
+        print(f"aviso: {c}", file=sys.stderr)
+    src = sys.stdin if args.inputs == "-" else open(args.inputs, encoding="utf-8")
+    total = ok = 0
+    t0 = time.perf_counter()
+    with src:
+        lines = (line.rstrip("\n") for line in src)
+        for r in parse_batch(lines, ACTION.tables, args.workers, args.chunk, recover):
+            total += 1
+            ok += r.accepted
+            if args.json:
+                print(json.dumps(asdict(r), ensure_ascii=False))
+            else:
+                status = "OK" if r.accepted else f"ERROR en {r.pos} ({r.token})"
+                if r.errors:
+                    status += f" y {len(r.errors) - 1} más" if len(r.errors) > 1 else ""
+                print(f"{r.index}\t{status}\t{r.seconds * 1000:.3f} ms")
+                for e in r.errors or ():
+                    print(f"\t{e['pos']}\t{e['token']}\t{e['recovery']}")
+    elapsed = time.perf_counter() - t0
+    print(f"{total} cadenas, {ok} válidas, {elapsed:.2f} s ({total / elapsed if elapsed else 0:.0f} cadenas/s)", file=sys.stderr)
+    return 0 if ok == total else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
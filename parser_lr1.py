@@ -1,8 +1,13 @@
+import importlib
 from grammar import (
     parse_grammar_text,
+    parse_precedence,
+    Precedence,
     first_sets,
     first_of_seq,
     follow_sets,
+    first_sets_bits,
+    follow_sets_bits,
     augment,
     prods_by_head,
     EPS,
@@ -10,38 +15,107 @@ from grammar import (
 )
 from lr1_items import (
     Item,
+    ItemSet,
+    LR1Context,
     closure,
     goto,
-    canonical_collection
-)
-from parser_tables import build_tables
-from parser_analyzer import (
-    analizar_cadena_lr,
-    analizar_cadena_lr_con_arbol
-)
-from parser_utils import (
-    first_follow_to_df,
-    action_table_df,
-    goto_table_df,
-    states_to_str
+    canonical_collection,
+    lalr_collection,
+    minimal_collection
 )
+from parser_tables import build_tables, MODES, COLLECTIONS
+from compiled_tables import CompiledTables, compile_tables
+from incremental import IncrementalGrammar, ClosureMemo, StateGraph
+from table_cache import TableCache, LazyStates, grammar_hash, default_cache
+from codegen import generate_module, write_module
+from lr_stats import LRStats, phase
+from error_recovery import parse_with_recovery, find_repair, RecoveryResult, SyntaxErrorInfo
+from glr import parse_glr, GLRResult, SPPFNode, count_trees, ambiguous_nodes, forest_to_tree, forest_to_dot
+from lr_driver import parse_tokens, ParseResult, Trace, PushParser, iter_tokens, read_chunks
 from parse_tree import (
     PTNode,
+    ParseTreeArena,
+    TreeNode,
     tree_to_dot,
-    tree_to_pretty_text
+    tree_to_pretty_text,
+    iter_dot,
+    iter_pretty_text,
+    write_dot,
+    write_pretty_text,
+    tree_to_json
 )
 
-def build_parser(prods, start, nonterminals, terminals):
-    FIRST = first_sets(nonterminals, terminals, prods)
-    return build_tables(prods, start, terminals, nonterminals, FIRST)
+_LAZY = {
+    "analizar_cadena": "parser_analyzer",
+    "analizar_cadena_lr": "parser_analyzer",
+    "analizar_cadena_lr_con_arbol": "parser_analyzer",
+    "analizar_errores": "parser_analyzer",
+    "first_follow_to_df": "parser_utils",
+    "action_table_df": "parser_utils",
+    "goto_table_df": "parser_utils",
+    "states_to_str": "parser_utils",
+    "state_to_str": "parser_utils",
+    "find_states": "parser_utils",
+}
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
+
+def build_parser(prods, start, nonterminals, terminals, mode="canonical", cache=True, stats=None, precedence=None,
+                 unit_elim=False):
+    if cache is True:
+        cache = default_cache()
+    if not cache:
+        with phase(stats, "first_sets"):
+            FIRST = first_sets(nonterminals, terminals, prods)
+        return build_tables(prods, start, terminals, nonterminals, FIRST, mode=mode, stats=stats, precedence=precedence,
+                            unit_elim=unit_elim)
+    key = grammar_hash(prods, start, mode, precedence, unit_elim)
+    with phase(stats, "cache_lookup"):
+        hit = cache.get(key)
+    if hit is not None:
+        if stats is not None:
+            stats.add("cache_hits")
+        tables, aug, conflicts, order = hit
+        prods = list(prods)
+        def rebuild_states():
+            FIRST = first_sets(nonterminals, terminals, prods)
+            return COLLECTIONS[mode](prods, start, FIRST, terminals, nonterminals)[0]
+        states = LazyStates(tables.nstates - tables.virtual, rebuild_states, order)
+        return tables.action, tables.goto, states, aug, conflicts
+    with phase(stats, "first_sets"):
+        FIRST = first_sets(nonterminals, terminals, prods)
+    ACTION, GOTO, C, aug, conflicts = build_tables(prods, start, terminals, nonterminals, FIRST, mode=mode, stats=stats,
+                                                   precedence=precedence, unit_elim=unit_elim)
+    with phase(stats, "cache_store"):
+        cache.put(key, ACTION.tables, aug, conflicts)
+    return ACTION, GOTO, C, aug, conflicts
 
 __all__ = [
     'EPS', 'END',
-    'parse_grammar_text', 'first_sets', 'first_of_seq', 'follow_sets',
+    'parse_grammar_text', 'parse_precedence', 'Precedence', 'first_sets', 'first_of_seq', 'follow_sets',
+    'first_sets_bits', 'follow_sets_bits',
     'augment', 'prods_by_head',
-    'Item', 'closure', 'goto', 'canonical_collection',
-    'build_tables', 'build_parser',
-    'analizar_cadena_lr', 'analizar_cadena_lr_con_arbol',
-    'first_follow_to_df', 'action_table_df', 'goto_table_df', 'states_to_str',
-    'PTNode', 'tree_to_dot', 'tree_to_pretty_text'
+    'Item', 'ItemSet', 'LR1Context', 'closure', 'goto', 'canonical_collection',
+    'lalr_collection', 'minimal_collection',
+    'build_tables', 'MODES', 'CompiledTables', 'compile_tables', 'build_parser',
+    'IncrementalGrammar', 'ClosureMemo', 'StateGraph',
+    'TableCache', 'LazyStates', 'grammar_hash', 'default_cache',
+    'generate_module', 'write_module',
+    'LRStats',
+    'parse_with_recovery', 'find_repair', 'RecoveryResult', 'SyntaxErrorInfo',
+    'parse_glr', 'GLRResult', 'SPPFNode', 'count_trees', 'ambiguous_nodes', 'forest_to_tree', 'forest_to_dot',
+    'parse_tokens', 'ParseResult', 'Trace', 'PushParser', 'iter_tokens', 'read_chunks',
+    'analizar_cadena', 'analizar_cadena_lr', 'analizar_cadena_lr_con_arbol', 'analizar_errores',
+    'first_follow_to_df', 'action_table_df', 'goto_table_df', 'states_to_str', 'state_to_str', 'find_states',
+    'PTNode', 'ParseTreeArena', 'TreeNode', 'tree_to_dot', 'tree_to_pretty_text',
+    'iter_dot', 'iter_pretty_text', 'write_dot', 'write_pretty_text', 'tree_to_json'
 ]
@@ -1,35 +1,183 @@
 from typing import Dict
-from lr1_items import canonical_collection, closure, goto
-from grammar import prods_by_head, END
+from lr1_items import (
+    closure,
+    canonical_collection,
+    lalr_collection,
+    minimal_collection,
+    core_key,
+    state_actions,
+)
+from compiled_tables import compile_tables
+from lr_stats import phase
 
-def build_tables(prods, start, terminals, nonterminals, FIRST):
-    C, index, aug, S_ = canonical_collection(prods, start, FIRST, terminals, nonterminals)
+MODES = {
+    "canonical": "LR(1) canónico",
+    "lalr": "LALR(1)",
+    "minimal": "LR(1) mínimo",
+}
+
+COLLECTIONS = {
+    "canonical": canonical_collection,
+    "lalr": lalr_collection,
+    "minimal": minimal_collection,
+}
+
+def merge_conflict_cells(prods, start, terminals, nonterminals, FIRST, C, cells, closure_fn=closure,
+                         canonical_fn=canonical_collection):
+    canon, _, aug, _, trans = canonical_fn(prods, start, FIRST, terminals, nonterminals, closure_fn)
+    out: Dict[int, list] = {}
+    for (i, X) in trans:
+        out.setdefault(i, []).append(X)
+    seen = set()
+    for i, I in enumerate(canon):
+        for t, a in state_actions(I, out.get(i, ()), aug, terminals).items():
+            if len(a) > 1:
+                seen.add((core_key(dict(I.kernel)), t))
+    return {(i, t) for (i, t) in cells if (core_key(dict(C[i].kernel)), t) not in seen}
+
+def build_tables(prods, start, terminals, nonterminals, FIRST, mode="canonical", closure_fn=closure, stats=None,
+                 precedence=None, unit_elim=False, canonical_fn=canonical_collection):
+    if mode not in COLLECTIONS:
+        raise ValueError(f"Modo de tabla desconocido: {mode} (usa {', '.join(MODES)})")
+    with phase(stats, "collection"):
+        if mode == "canonical":
+            C, index, aug, S_, trans = canonical_fn(prods, start, FIRST, terminals, nonterminals, closure_fn, stats)
+        elif mode == "minimal":
+            C, index, aug, S_, trans = minimal_collection(prods, start, FIRST, terminals, nonterminals, closure_fn, stats,
+                                                          canonical_fn)
+        else:
+            C, index, aug, S_, trans = lalr_collection(prods, start, FIRST, terminals, nonterminals, closure_fn, stats)
+    with phase(stats, "actions"):
+        ACTION, GOTO, clashes, resolved = _fill(C, aug, S_, trans, terminals, precedence)
+    cells = conflict_cells(clashes)
+    merged = set()
+    if mode == "lalr" and clashes:
+        with phase(stats, "lalr_conflict_origin"):
+            merged = merge_conflict_cells(prods, start, terminals, nonterminals, FIRST, C, set(cells),
+                                          closure_fn, canonical_fn)
+    conflicts = conflict_messages(clashes, merged)
+    nstates, chains = len(C), None
+    if unit_elim and not clashes:
+        with phase(stats, "unit_elim"):
+            ACTION, GOTO, nstates, chains = eliminate_unit_reductions(ACTION, GOTO, aug, S_, len(C))
+    with phase(stats, "compile"):
+        tables = compile_tables(ACTION, GOTO, aug, nstates=nstates, conflicts=cells, unit_chains=chains,
+                                virtual=nstates - len(C))
+    if stats is not None:
+        stats.add("action_entries", len(ACTION))
+        stats.add("goto_entries", len(GOTO))
+        stats.add("conflicts", len(conflicts))
+        if resolved:
+            stats.add("conflicts_resolved", resolved)
+        if chains:
+            stats.add("unit_chains", len(chains))
+            stats.add("virtual_states", nstates - len(C))
+        stats.add("table_bytes", tables.nbytes())
+    return tables.action, tables.goto, C, aug, conflicts
+
+def conflict_cells(clashes) -> Dict[tuple, list]:
+    cells: Dict[tuple, list] = {}
+    for k, old, new in clashes:
+        cells.setdefault(k, [old]).append(new)
+    return cells
+
+def conflict_messages(clashes, merged=()):
+    out = []
+    for k, old, new in clashes:
+        note = " (por fusión de estados LALR)" if k in merged else ""
+        out.append(f"Conflicto en ACTION{k}: {old} vs {new}{note}")
+    return out
+
+def _add_action(ACTION, k, v, aug, terminals, precedence, clashes) -> int:
+    old = ACTION.get(k)
+    if old is None or old == v:
+        ACTION[k] = v
+        return 0
+    if precedence and old[0] == 'reduce' and v[0] == 'shift':
+        rule = precedence.of_rule(old[1], aug[old[1]][1], terminals)
+        tok = precedence.levels.get(k[1])
+        if rule is not None and tok is not None:
+            if tok[0] > rule[0] or (tok[0] == rule[0] and tok[1] == "right"):
+                ACTION[k] = v
+            elif tok[0] == rule[0] and tok[1] == "nonassoc":
+                del ACTION[k]
+            return 1
+    clashes.append((k, old, v))
+    ACTION[k] = v
+    return 0
+
+def _fill(C, aug, S_, trans, terminals, precedence=None):
     ACTION: Dict[tuple, tuple] = {}
     GOTO: Dict[tuple, int] = {}
-    conflicts = []
-    def add_action(k, v):
-        if k in ACTION and ACTION[k] != v:
-            conflicts.append(f"Conflicto en ACTION{k}: {ACTION[k]} vs {v}")
-        ACTION[k] = v
-    by_head = prods_by_head(aug)
+    rr, sr = [], []
+    resolved = 0
     for i, I in enumerate(C):
-        for it in I:
-            pidx, dot, la = it.prod_idx, it.dot, it.look
-            H, B = aug[pidx]
-            if dot < len(B):
-                a = B[dot]
-                base = goto(I, a, aug)
-                if a in terminals and base:
-                    J = closure(base, aug, by_head, FIRST, nonterminals | {S_})
-                    j = index[frozenset(J)]
-                    add_action((i, a), ('shift', j))
-                elif a in nonterminals and base:
-                    J = closure(base, aug, by_head, FIRST, nonterminals | {S_})
-                    j = index[frozenset(J)]
-                    GOTO[(i, a)] = j
-            else:
-                if H == S_ and la == END:
-                    add_action((i, END), ('accept', 0))
-                else:
-                    add_action((i, la), ('reduce', pidx))
-    return ACTION, GOTO, C, aug, conflicts
+        for la, act in I.reductions(aug, S_):
+            resolved += _add_action(ACTION, (i, la), act, aug, terminals, precedence, rr)
+    for (i, X), j in trans.items():
+        if X in terminals:
+            resolved += _add_action(ACTION, (i, X), ('shift', j), aug, terminals, precedence, sr)
+        else:
+            GOTO[(i, X)] = j
+    return ACTION, GOTO, rr + sr, resolved
+
+def fill_state(i, I, moves, aug, S_, terminals, precedence, ACTION, GOTO):
+    rr, sr = [], []
+    resolved = 0
+    for la, act in I.reductions(aug, S_):
+        resolved += _add_action(ACTION, (i, la), act, aug, terminals, precedence, rr)
+    for X, j in moves:
+        if X in terminals:
+            resolved += _add_action(ACTION, (i, X), ('shift', j), aug, terminals, precedence, sr)
+        else:
+            GOTO[(i, X)] = j
+    return rr, sr, resolved
+
+def eliminate_unit_reductions(ACTION, GOTO, aug, S_, nstates):
+    heads = {H for H, _ in aug}
+    units = {p for p, (H, B) in enumerate(aug) if len(B) == 1 and B[0] in heads and H != S_}
+    rows = [dict() for _ in range(nstates)]
+    for (s, a), act in ACTION.items():
+        rows[s][a] = act
+    grows = [dict() for _ in range(nstates)]
+    for (s, X), j in GOTO.items():
+        grows[s][X] = j
+    ACTION2, GOTO2 = dict(ACTION), dict(GOTO)
+    virtual: Dict[tuple, int] = {}
+    chains: Dict[tuple, list] = {}
+    for (p, B), q in GOTO.items():
+        if not any(act[0] == 'reduce' and act[1] in units for act in rows[q].values()):
+            continue
+        row, grow, by_chain = {}, {}, {}
+        ok = True
+        for a, act in rows[q].items():
+            f, chain, seen = q, (), {q}
+            while act is not None and act[0] == 'reduce' and act[1] in units:
+                g = GOTO.get((p, aug[act[1]][0]))
+                if g is None or g in seen:
+                    break
+                chain += (act[1],)
+                seen.add(g)
+                f, act = g, rows[g].get(a)
+            if act is not None:
+                row[a] = act
+            by_chain.setdefault(chain, []).append(a)
+            for X, j in grows[f].items():
+                if grow.setdefault(X, j) != j:
+                    ok = False
+        if not ok or list(by_chain) == [()]:
+            continue
+        target = next((f for f in (GOTO.get((p, aug[c[-1]][0])) for c in by_chain if c)
+                       if rows[f] == row and grows[f] == grow), None)
+        if target is None:
+            key = (tuple(sorted(row.items())), tuple(sorted(grow.items())))
+            target = virtual.get(key)
+            if target is None:
+                target = virtual[key] = nstates + len(virtual)
+                for a, act in row.items():
+                    ACTION2[(target, a)] = act
+                for X, j in grow.items():
+                    GOTO2[(target, X)] = j
+        GOTO2[(p, B)] = target
+        chains[(p, B)] = [(c, las) for c, las in by_chain.items() if c]
+    return ACTION2, GOTO2, nstates + len(virtual), chains
@@ -1,8 +1,8 @@
-import pandas as pd
-from typing import Dict, Set
+from typing import Dict, Iterable, List, Optional, Set
 from grammar import END
 
 def first_follow_to_df(FIRST: Dict[str, Set[str]], FOLLOW: Dict[str, Set[str]], nonterminals: Set[str]):
+    import pandas as pd
     rows = []
     for A in sorted(nonterminals):
         rows.append({
@@ -12,10 +12,14 @@ def first_follow_to_df(FIRST: Dict[str, Set[str]], FOLLOW: Dict[str, Set[str]],
         })
     return pd.DataFrame(rows)
 
-def action_table_df(ACTION, terminals, nstates):
-    rows = []
+def _compact(rows, cols):
+    return [c for c in cols if any(r[c] != "" for r in rows)] if rows else cols
+
+def action_table_df(ACTION, terminals, nstates, rows: Optional[Iterable[int]] = None, compact: bool = False):
+    import pandas as pd
+    out = []
     cols = sorted(list(terminals)) + [END]
-    for s in range(nstates):
+    for s in (range(nstates) if rows is None else rows):
         row = {"state": s}
         for t in cols:
             act = ACTION.get((s, t))
@@ -29,28 +33,43 @@ def action_table_df(ACTION, terminals, nstates):
                     row[t] = f"r{a}"
                 else:
                     row[t] = "acc"
-        rows.append(row)
-    return pd.DataFrame(rows).set_index("state")
+        out.append(row)
+    if compact:
+        cols = _compact(out, cols)
+    return pd.DataFrame(out, columns=["state"] + cols).set_index("state")
 
-def goto_table_df(G, nonterminals, nstates):
-    rows = []
+def goto_table_df(G, nonterminals, nstates, rows: Optional[Iterable[int]] = None, compact: bool = False):
+    import pandas as pd
+    out = []
     cols = sorted(list(nonterminals))
-    for s in range(nstates):
+    for s in (range(nstates) if rows is None else rows):
         row = {"state": s}
         for A in cols:
             row[A] = G.get((s, A), "")
-        rows.append(row)
-    return pd.DataFrame(rows).set_index("state")
+        out.append(row)
+    if compact:
+        cols = _compact(out, cols)
+    return pd.DataFrame(out, columns=["state"] + cols).set_index("state")
+
+def state_to_str(i: int, I, aug) -> str:
+    lines = []
+    for (pidx, dot), mask in sorted(I.items.items()):
+        H, B = aug[pidx]
+        body = list(B)
+        body.insert(dot, "•")
+        rhs = " ".join(body) if body else "•"
+        lines.append(f"I{i}: [{H} → {rhs}, {'/'.join(I.lookaheads(mask))}]")
+    return "\n".join(lines)
+
+def states_to_str(states, aug, rows: Optional[Iterable[int]] = None):
+    return "\n\n".join(state_to_str(i, states[i], aug) for i in (range(len(states)) if rows is None else rows))
 
-def states_to_str(states, aug):
-    blocks = []
-    for i, I in enumerate(states):
-        lines = []
-        for it in sorted(I, key=lambda x: (x.prod_idx, x.dot, x.look)):
-            H, B = aug[it.prod_idx]
-            body = list(B)
-            body.insert(it.dot, "•")
-            rhs = " ".join(body) if body else "•"
-            lines.append(f"I{i}: [{H} → {rhs}, {it.look}]")
-        blocks.append("\n".join(lines))
-    return "\n\n".join(blocks)
+def find_states(states, aug, query: str) -> List[int]:
+    q = query.strip()
+    if not q:
+        return list(range(len(states)))
+    num = q[1:] if q[:1] in "Ii" else q
+    if num.isdigit():
+        return [int(num)] if int(num) < len(states) else []
+    q = " ".join(q.split())
+    return [i for i, I in enumerate(states) if q in state_to_str(i, I, aug)]
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import mmap
+import os
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Optional
+from compiled_tables import FORMAT_VERSION, CompiledTables, to_bytes, from_buffer
+
+def grammar_hash(prods, start, mode="canonical", precedence=None, unit_elim=False) -> str:
+    norm = [FORMAT_VERSION, mode, start, [[H, list(B)] for H, B in prods]]
+    if precedence:
+        norm.append(precedence.key())
+    if unit_elim:
+        norm.append("unit_elim")
+    data = json.dumps(norm, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+class LazyStates(Sequence):
+    def __init__(self, n: int, build, order=None):
+        self._n = n
+        self._build = build
+        self._order = order
+        self._states = None
+
+    def _load(self):
+        if self._states is None:
+            states = self._build()
+            self._states = [states[i] for i in self._order] if self._order else states
+        return self._states
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, i):
+        return self._load()[i]
+
+    def __iter__(self):
+        return iter(self._load())
+
+class TableCache:
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = 64 << 20, max_entries: int = 32):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._mem: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.lr1")
+
+    def _remember(self, key, entry):
+        self._mem[key] = entry
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def get(self, key: str):
+        entry = self._mem.get(key)
+        if entry is not None:
+            self._mem.move_to_end(key)
+            return entry
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            tables, extra = from_buffer(mm)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        entry = (tables, [(H, B) for H, B in extra["aug"]], extra["conflicts"], extra.get("order"))
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, tables: CompiledTables, aug, conflicts, order=None):
+        entry = (tables, list(aug), list(conflicts), order)
+        self._remember(key, entry)
+        if not self.directory:
+            return
+        extra = {"aug": [[H, list(B)] for H, B in aug], "conflicts": list(conflicts)}
+        if order:
+            extra["order"] = list(order)
+        data = to_bytes(tables, extra)
+        if len(data) > self.max_bytes:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = self._path(key) + f".{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self._path(key))
+            self._evict()
+        except OSError:
+            pass
+
+    def _evict(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".lr1"):
+                st = os.stat(os.path.join(self.directory, name))
+                files.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        self._mem.clear()
+        if self.directory and os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".lr1"):
+                    os.remove(os.path.join(self.directory, name))
+
+_default_cache: Optional[TableCache] = None
+
+def default_cache() -> TableCache:
+    global _default_cache
+    if _default_cache is None:
+        directory = os.environ.get("LR1_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "lr1_tables")
+        _default_cache = TableCache(directory)
+    return _default_cache